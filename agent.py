@@ -1,77 +1,393 @@
-from ollama import chat
-from ollama import ChatResponse
-from PySide6.QtCore import QThread, Signal
+import itertools
+import queue
+import threading
+import time
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from ollamaClient import chat, list_models, load_model, running_models, unload_model
+from promptBuilder import (PromptBuilder, extract_message_content, extract_sql, is_sql_query, response_stats,
+                           trace_stats)
+from timingSpans import Trace
 
 
 class OllamaAgent(QThread):
-    response_received = Signal(str, str)  # SQL query and response
-    error_occurred = Signal(str)
+    """Long-lived worker that answers queued questions one at a time.
+
+    Every request gets an id that is passed back with each signal. Once more than
+    max_in_flight requests are queued or running, the oldest ones are superseded:
+    they are cancelled (mid-stream if running) and nothing more is emitted for them.
+    Stage timings (queue wait, prompt build, generation and Ollama's own durations)
+    are added to the request's trace before its response is emitted.
+
+    A request may carry a validator (sql -> list of problems). SQL that fails it is
+    sent back to the model with the problems, up to max_repairs times; each retry is
+    announced with a "repair" response, and problems left after the last one with an
+    "invalid" response just before the "sql" response. With escalate_to set, the first
+    failed validation instead hands the question to that (larger) model, announced with
+    an "escalate" response carrying its name; repairs then continue with it.
+    """
+    response_received = Signal(int, str, str)  # request id, response type ("sql", "complete", "repair", "invalid", "escalate"), content
+    token_received = Signal(int, str)  # partial completion text while streaming
+    first_token = Signal(int, float)  # time to first token in seconds
+    stats_received = Signal(int, dict)  # Ollama's prompt-eval / eval counts and durations
+    error_occurred = Signal(int, str)
+    request_cancelled = Signal(int)
     status_update = Signal(str)
-    def __init__(self, query: str, model_name: str, db_schema: str, db_tables: list[str]):
+    def __init__(self, max_in_flight: int = 1, keep_alive: str = "30m"):
         super().__init__()
-        self.query = query
-        self.model_name = model_name
-        self.db_schema = db_schema
-        self.db_tables = db_tables
+        self.max_in_flight = max_in_flight
+        self.keep_alive = keep_alive
+        self.prompts = PromptBuilder()
+        self._requests = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._in_flight = []  # oldest first
+        self._cancelled = set()
         self._is_running = True
-    
+
+    def submit(self, query: str, model_name: str, db_schema: str, db_tables: list[str], stream: bool = True,
+               all_tables: list[str] = None, schema_fingerprint: str = None, trace: Trace = None,
+               validator=None, max_repairs: int = 0, escalate_to: str = None) -> int:
+        with self._lock:
+            request_id = next(self._ids)
+            self._in_flight.append(request_id)
+            superseded = []
+            while len(self._in_flight) > max(1, self.max_in_flight):
+                superseded.append(self._in_flight.pop(0))
+            self._cancelled.update(superseded)
+
+        for old_id in superseded:
+            self.request_cancelled.emit(old_id)
+
+        self._requests.put({
+            "id": request_id,
+            "query": query,
+            "model_name": model_name,
+            "db_schema": db_schema,
+            "db_tables": db_tables,
+            "all_tables": all_tables if all_tables is not None else db_tables,
+            "schema_fingerprint": schema_fingerprint,
+            "stream": stream,
+            "trace": trace if trace is not None else Trace("question"),
+            "validator": validator,
+            "max_repairs": max_repairs,
+            "escalate_to": escalate_to,
+            "submitted": time.perf_counter()
+        })
+        return request_id
+
+    def cancel(self, request_id: int = None):
+        """Cancel one request, or every queued and running request when no id is given."""
+        with self._lock:
+            if request_id is None:
+                cancelled = list(self._in_flight)
+            elif request_id in self._in_flight:
+                cancelled = [request_id]
+            else:
+                cancelled = []
+            for cancelled_id in cancelled:
+                self._in_flight.remove(cancelled_id)
+            self._cancelled.update(cancelled)
+
+        for cancelled_id in cancelled:
+            self.request_cancelled.emit(cancelled_id)
+
+    def is_cancelled(self, request_id: int) -> bool:
+        return not self._is_running or request_id in self._cancelled
+
     def stop(self):
         self._is_running = False
-        self.quit()
+        self.cancel()
+        self._requests.put(None)
         self.wait()
+
     def run(self):
+        while self._is_running:
+            request = self._requests.get()
+            if request is None:
+                break
+
+            if not self.is_cancelled(request["id"]):
+                request["trace"].add("agent.queue", time.perf_counter() - request["submitted"], start=request["submitted"])
+                self.handle_request(request)
+
+            with self._lock:
+                if request["id"] in self._in_flight:
+                    self._in_flight.remove(request["id"])
+                self._cancelled.discard(request["id"])
+
+    def handle_request(self, request):
+        request_id = request["id"]
+        trace = request["trace"]
         try:
             self.status_update.emit("Generating SQL query...")
-            
-            system_prompt = f"""
-            You are a SQL expert. Given the following database tables:
-            {', '.join(self.db_tables)}.
-            
-            Database Schema:
-            {self.db_schema}
-            
-            Instructions:
-            1. Convert the user's natural language question into a valid SQL query.
-            2. Only use tables and columns that exist in the schema.
-            3. Return ONLY the SQL code in a single line.
-            4. If the query is ambiguous, make reasonable assumptions and note them in comments.
-            5. If the query cannot be answered with the given schema, explain why.
-            
-            Example:
-            User: Show me all users who signed up last month
-            Response: SELECT * FROM users WHERE signup_date >= DATE_TRUNC('month', CURRENT_DATE - INTERVAL '1 month') AND signup_date < DATE_TRUNC('month', CURRENT_DATE);
-            """
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": self.query}
-            ]
-            
+
+            with trace.span("prompt"):
+                messages = self.build_messages(request)
+
             # print("Input: ", messages)
-            
-            response = chat(
-                model=self.model_name,
-                messages=messages
-            )
-            
-            # print("Response: ", response)
-            # print("Type: ", type(response))
-            
-            if response and 'message' in response:
-                self.response_received.emit("sql", self.extract_message_content(response))
-                self.response_received.emit("complete", self.extract_message_content(response))
+
+            content = self.generate(request, messages)
+            repairs = 0
+            while content and request["validator"] is not None and not self.is_cancelled(request_id):
+                sql = extract_sql(content)
+                if not is_sql_query(sql):
+                    break
+                with trace.span("sql.validate") as attributes:
+                    problems = request["validator"](sql)
+                    attributes["problems"] = len(problems)
+                if not problems:
+                    break
+                if request["escalate_to"] and request["escalate_to"] != request["model_name"]:
+                    request["model_name"] = request["escalate_to"]
+                    request["escalate_to"] = None
+                    self.status_update.emit(f"Asking {request['model_name']}...")
+                    self.response_received.emit(request_id, "escalate", request["model_name"])
+                    messages = self.prompts.repair_messages(messages, content, problems)
+                    content = self.generate(request, messages)
+                    continue
+                if repairs >= request["max_repairs"]:
+                    self.response_received.emit(request_id, "invalid", "\n".join(problems))
+                    break
+                repairs += 1
+                self.status_update.emit(f"Fixing SQL ({repairs}/{request['max_repairs']})...")
+                self.response_received.emit(request_id, "repair", "\n".join(problems))
+                messages = self.prompts.repair_messages(messages, content, problems)
+                content = self.generate(request, messages)
+
+            if self.is_cancelled(request_id):
+                return
+            if content:
+                self.response_received.emit(request_id, "sql", content)
+                self.response_received.emit(request_id, "complete", content)
             else:
-                self.error_occurred.emit("No response from model")
-            
-            
+                self.error_occurred.emit(request_id, "No response from model")
+
         except Exception as e:
-            self.error_occurred.emit(f"Error generating SQL: {str(e)}")
+            if not self.is_cancelled(request_id):
+                self.error_occurred.emit(request_id, f"Error generating SQL: {str(e)}")
         finally:
             self.status_update.emit("Ready")
-            
+
+    def generate(self, request, messages):
+        """One completion for messages, streamed or not; returns its text (None when cancelled or empty)."""
+        request_id = request["id"]
+        trace = request["trace"]
+        if request["stream"]:
+            content = self.stream_chat(request_id, request["model_name"], messages, trace)
+            return None if self.is_cancelled(request_id) else content
+
+        with trace.span("llm.generate"):
+            response = chat(
+                model=request["model_name"],
+                messages=messages,
+                keep_alive=self.keep_alive
+            )
+
+        # print("Response: ", response)
+        # print("Type: ", type(response))
+
+        if self.is_cancelled(request_id) or not response or 'message' not in response:
+            return None
+        trace_stats(trace, self.emit_stats(request_id, response), time.perf_counter())
+        return self.extract_message_content(response)
+
+    def build_messages(self, request):
+        return self.prompts.build_messages(request)
+
+    def emit_stats(self, request_id, response):
+        stats = response_stats(response)
+        if stats:
+            self.stats_received.emit(request_id, stats)
+        return stats
+
+    def stream_chat(self, request_id, model_name, messages, trace=None):
+        """Stream the completion, emitting each chunk; stops early once the request is cancelled."""
+        started = time.perf_counter()
+        content = ""
+        stats, stats_at = None, None
+        stream = chat(
+            model=model_name,
+            messages=messages,
+            stream=True,
+            keep_alive=self.keep_alive
+        )
+        try:
+            for chunk in stream:
+                if self.is_cancelled(request_id):
+                    break
+                if chunk.get("done"):
+                    # The final chunk carries the timing counters
+                    stats, stats_at = self.emit_stats(request_id, chunk), time.perf_counter()
+                piece = self.extract_message_content(chunk)
+                if not piece:
+                    continue
+                if not content:
+                    elapsed = time.perf_counter() - started
+                    if trace is not None:
+                        trace.add("llm.first_token", elapsed, start=started)
+                    self.first_token.emit(request_id, elapsed)
+                content += piece
+                self.token_received.emit(request_id, piece)
+        finally:
+            # Closing the generator drops the HTTP response, which makes Ollama stop generating
+            stream.close()
+            if trace is not None:
+                trace.add("llm.generate", time.perf_counter() - started, start=started)
+                if stats:
+                    trace_stats(trace, stats, stats_at)
+        return content
+
     def extract_message_content(self, response):
-        if hasattr(response, "message"):
-            return response.message.content
-        if isinstance(response, dict):
-            return response.get("message", {}).get("content")
-        return None
\ No newline at end of file
+        return extract_message_content(response)
+
+
+class ModelListWorker(QThread):
+    """Asks the local Ollama server for its models in the background (GET /api/tags)."""
+    models_loaded = Signal(list)
+    failed = Signal(str)
+
+    def run(self):
+        try:
+            self.models_loaded.emit(list_models())
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+def model_key(name):
+    # "gemma3" and "gemma3:latest" are the same model to Ollama
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelLoader(QThread):
+    """Unloads the previous model (if any) and loads model, so only one stays in memory."""
+    loaded = Signal(str, float)  # model, seconds the load took
+    failed = Signal(str, str)
+
+    def __init__(self, model, keep_alive, previous=None):
+        super().__init__()
+        self.model = model
+        self.keep_alive = keep_alive
+        self.previous = previous
+
+    def run(self):
+        if self.previous and model_key(self.previous) != model_key(self.model):
+            try:
+                unload_model(self.previous)
+            except Exception as e:
+                print(f"Could not unload {self.previous}: {e}")
+        started = time.perf_counter()
+        try:
+            load_model(self.model, keep_alive=self.keep_alive)
+            self.loaded.emit(self.model, time.perf_counter() - started)
+        except Exception as e:
+            self.failed.emit(self.model, str(e))
+
+
+class ModelStatusWorker(QThread):
+    """Asks Ollama which models are in memory (GET /api/ps)."""
+    models_loaded = Signal(list)
+    failed = Signal(str)
+
+    def run(self):
+        try:
+            self.models_loaded.emit(running_models())
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class ModelWarmer(QObject):
+    """Keeps the selected model loaded so the first question does not pay for the load.
+
+    select() loads the model in the background (unloading the one selected before) with
+    Ollama's keep_alive, so it stays in memory for that long after its last use. Loads run
+    one at a time; a selection made during a load waits for it. Every check_interval
+    seconds /api/ps is asked whether the model is still in memory. state_changed reports
+    "loading", "warm", "cold" (unloaded after the idle period) or "failed".
+    """
+    state_changed = Signal(str, str)  # model, state
+
+    def __init__(self, keep_alive="30m", check_interval=60):
+        super().__init__()
+        self.keep_alive = keep_alive
+        self.model = None  # selected model
+        self.loaded_model = None  # last model a load was started for, unloaded on the next switch
+        self.state = None
+        self._shown = None
+        self.loader = None
+        self.status_worker = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(check_interval * 1000))
+        self.timer.timeout.connect(self.check)
+        self.timer.start()
+
+    def set_state(self, state):
+        if (self.model, state) != self._shown:
+            self._shown = (self.model, state)
+            self.state = state
+            self.state_changed.emit(self.model or "", state)
+
+    def select(self, model):
+        if not model or (self.model == model and self.state in ("loading", "warm")):
+            return
+        self.model = model
+        self.set_state("loading")
+        if self.loader is None:
+            self.start_loader()
+
+    def start_loader(self):
+        self.loader = ModelLoader(self.model, self.keep_alive, previous=self.loaded_model)
+        self.loaded_model = self.model
+        self.loader.loaded.connect(self.handle_loaded)
+        self.loader.failed.connect(self.handle_failed)
+        self.loader.finished.connect(self.handle_loader_finished)
+        self.loader.start()
+
+    def handle_loaded(self, model, seconds):
+        if model == self.model:
+            print(f"🔥 {model} loaded in {seconds:.1f}s")
+            self.set_state("warm")
+
+    def handle_failed(self, model, error):
+        if model == self.model:
+            print(f"Could not load {model}: {error}")
+            self.set_state("failed")
+
+    def handle_loader_finished(self):
+        finished = self.loader
+        self.loader = None
+        finished.deleteLater()
+        if self.model != finished.model:
+            self.start_loader()  # selected while loading
+
+    def check(self):
+        if self.model is None or self.loader is not None or self.status_worker is not None:
+            return
+        self.status_worker = ModelStatusWorker()
+        self.status_worker.models_loaded.connect(self.handle_running_models)
+        self.status_worker.finished.connect(self.handle_status_finished)
+        self.status_worker.start()
+
+    def handle_running_models(self, models):
+        if self.loader is not None:
+            return
+        if model_key(self.model) in {model_key(name) for name in models}:
+            self.set_state("warm")
+        elif self.state != "failed":
+            self.set_state("cold")
+
+    def handle_status_finished(self):
+        self.status_worker.deleteLater()
+        self.status_worker = None
+
+    def mark_used(self):
+        """A question just went to the model, which loads it (again) if it had been unloaded."""
+        if self.model is not None and self.state == "cold":
+            self.set_state("warm")
+
+    def shutdown(self):
+        self.timer.stop()
+        for worker in (self.loader, self.status_worker):
+            if worker is not None:
+                worker.wait(2000)
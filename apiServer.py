@@ -0,0 +1,119 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ASK_OPTIONS = ("execute", "max_rows", "use_cache")
+MAX_ROWS = 10000  # upper bound of "max_rows", so one request cannot pull a whole table
+
+
+def ask_options(request):
+    """The answer options of a request body, or raise ValueError naming the bad one."""
+    options = {key: request[key] for key in ASK_OPTIONS if key in request}
+    for key in ("execute", "use_cache"):
+        if key in options and not isinstance(options[key], bool):
+            raise ValueError(f"\"{key}\" must be true or false")
+    if "max_rows" in options:
+        max_rows = options["max_rows"]
+        if isinstance(max_rows, bool) or not isinstance(max_rows, int) or not 0 < max_rows <= MAX_ROWS:
+            raise ValueError(f"\"max_rows\" must be a whole number from 1 to {MAX_ROWS}")
+    return options
+
+
+class ApiServer:
+    """Small local HTTP/JSON front end for a QueryPipeline.
+
+    Every connection gets its own thread, but questions are answered on one shared
+    executor of concurrency workers, so no more than that many questions hit the model
+    and the connection pool at once; the rest wait their turn.
+
+        GET  /api/health                      -> {"status": "ok", "model": ..., "concurrency": ...,
+                                                  "routing": ... (ModelRouter.stats, when routing is on)}
+        POST /api/ask    {"question": "..."}  -> one result (see QueryPipeline.answer)
+        POST /api/batch  {"questions": [...]} -> {"results": [...]} in the same order
+
+    ask and batch also take the answer options "execute", "use_cache" (booleans) and
+    "max_rows" (1 to MAX_ROWS); anything else there is answered with a 400.
+    """
+    def __init__(self, pipeline, host="127.0.0.1", port=8765, concurrency=4):
+        self.pipeline = pipeline
+        self.concurrency = max(1, concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="querymind-api")
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def ask(self, questions, options):
+        futures = [self.executor.submit(self.pipeline.answer, question, **options) for question in questions]
+        return [future.result() for future in futures]
+
+    def handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/api/health":
+                    return self.send_json(404, {"error": "Not found"})
+                health = {"status": "ok", "model": api.pipeline.model_name, "concurrency": api.concurrency}
+                if api.pipeline.router is not None:
+                    health["routing"] = api.pipeline.router.stats()
+                self.send_json(200, health)
+
+            def do_POST(self):
+                path = self.path.rstrip("/")
+                if path not in ("/api/ask", "/api/batch"):
+                    return self.send_json(404, {"error": "Not found"})
+                try:
+                    body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                    request = json.loads(body or b"{}")
+                except (ValueError, TypeError):
+                    return self.send_json(400, {"error": "Request body must be JSON"})
+                if not isinstance(request, dict):
+                    return self.send_json(400, {"error": "Request body must be a JSON object"})
+
+                try:
+                    options = ask_options(request)
+                except ValueError as e:
+                    return self.send_json(400, {"error": str(e)})
+                if path == "/api/ask":
+                    question = request.get("question")
+                    if not isinstance(question, str) or not question.strip():
+                        return self.send_json(400, {"error": "\"question\" is required"})
+                    return self.send_json(200, api.ask([question.strip()], options)[0])
+
+                questions = request.get("questions")
+                if not isinstance(questions, list) or not all(isinstance(q, str) and q.strip() for q in questions):
+                    return self.send_json(400, {"error": "\"questions\" must be a list of questions"})
+                self.send_json(200, {"results": api.ask([q.strip() for q in questions], options)})
+
+            def send_json(self, status, payload):
+                # Row values may be dates, decimals, ...
+                data = json.dumps(payload, default=str, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
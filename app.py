@@ -1,21 +1,36 @@
-from nt import error
+import time
+STARTED_AT = time.perf_counter()  # startup is measured from here to the first painted window
 import sys
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                             QTextEdit, QScrollArea, QTabWidget, QFrame, 
-                             QGridLayout, QSpacerItem, QSizePolicy, QMessageBox, QComboBox)
+                             QTextEdit, QTabWidget, QFrame, 
+                             QGridLayout, QSpacerItem, QSizePolicy, QMessageBox, QComboBox,
+                             QTableView, QHeaderView, QListView, QAbstractItemView,
+                             QListWidget, QListWidgetItem, QFileDialog)
 from PySide6.QtCore import Qt, QSize, Signal, QTimer
-from PySide6.QtGui import QFont, QIcon, QColor, QPalette
+from PySide6.QtGui import QFont, QIcon, QColor, QPalette, QFontDatabase
 from PySide6 import QtGui
 
-from agent import OllamaAgent
-from dbManager import DatabaseManager
+from agent import OllamaAgent, ModelListWorker, ModelWarmer
+from dbManager import DatabaseManager, returns_rows
+from schemaIndex import SchemaContext
+from modelRouter import router_from_config
+from promptBuilder import extract_sql, is_sql_query
+from queryCache import QueryCache
+from queryWorker import QueryWorker, PreflightWorker, ExportWorker
+from resultExport import available_formats
+from queryPlan import plan_warnings
+from resultModel import ResultTableModel
+from chatHistory import ChatHistoryModel, ChatDelegate, spill_rows, load_spilled_rows
+from historyStore import HistoryStore
+from timingSpans import Trace, SpanLog
 import subprocess
 import json
-import re
 from datetime import datetime
 import os
 
+IMPORTED_AT = time.perf_counter()
+
 # Custom CSS for modern look
 STYLE_SHEET = """
 QMainWindow {
@@ -85,6 +100,7 @@ QPushButton#IconButton {
 """
 DBManager = None
 global model_name_global
+config_global = {}
 
 basedir = os.path.dirname(__file__)
 
@@ -121,17 +137,192 @@ class ChatMessage(QFrame):
             }}
         """)
         
-        msg_label = QLabel(text)
-        msg_label.setWordWrap(True)
-        msg_label.setStyleSheet("color: #111827; background: transparent; border: none;")
+        self.msg_label = QLabel(text)
+        self.msg_label.setWordWrap(True)
+        self.msg_label.setStyleSheet("color: #111827; background: transparent; border: none;")
         
         time = datetime.now()
-        time_label = QLabel(time.strftime("%I:%M %p")) # Placeholder timestamp
-        time_label.setStyleSheet("color: #9ca3af; font-size: 10px; background: transparent; border: none;")
-        time_label.setAlignment(Qt.AlignRight)
+        self.timestamp = time.strftime("%I:%M %p")
+        self.time_label = QLabel(self.timestamp) # Placeholder timestamp
+        self.time_label.setStyleSheet("color: #9ca3af; font-size: 10px; background: transparent; border: none;")
+        self.time_label.setAlignment(Qt.AlignRight)
+        self.note = None
         
-        layout.addWidget(msg_label)
-        layout.addWidget(time_label)
+        layout.addWidget(self.msg_label)
+        layout.addWidget(self.time_label)
+    
+    def set_text(self, text):
+        self.msg_label.setText(text)
+    
+    def append_text(self, text):
+        self.msg_label.setText(self.msg_label.text() + text)
+    
+    def set_note(self, note):
+        self.note = note
+        self.time_label.setText(f"{note} · {self.timestamp}")
+
+class ResultMessage(ChatMessage):
+    """A message bubble showing a query result in a grid that fetches rows as it is scrolled.
+
+    Without a worker it shows rows loaded back from a spilled result instead. With a trace,
+    execution stages are timed into it up to the first rows on screen (or the end of the
+    run, when there are none), then trace_finished is emitted.
+    """
+    trace_finished = Signal(object)
+    worker_restarted = Signal(object)  # the worker, started again for the full query
+    
+    def __init__(self, worker, preview_note=None, trace=None, parent=None):
+        super().__init__("Executing query..." if worker else "", is_assistant=True, parent=parent)
+        self.worker = worker
+        self.preview_note = preview_note
+        self.trace = None
+        self.full_requested = False
+        
+        self.model = ResultTableModel(parent=self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.view.setSortingEnabled(True)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.view.setMinimumHeight(280)
+        self.view.setStyleSheet("background-color: white; border: 1px solid #e5e7eb; border-radius: 6px; margin: 0px;")
+        self.view.hide()
+        
+        self.cancel_btn = QPushButton("Cancel")
+        
+        # Connected by the chat, which checks the plan of the full query before it runs
+        self.full_btn = QPushButton("Run full query")
+        self.full_btn.hide()
+        
+        # Connected by the chat, which runs the export
+        self.export_btn = QPushButton("Export…")
+        self.export_btn.hide()
+        
+        # Collapsed timing breakdown, shown once the run has finished
+        self.timings_btn = QPushButton("▸ Timings")
+        self.timings_btn.setCheckable(True)
+        self.timings_btn.toggled.connect(self.toggle_timings)
+        self.timings_btn.hide()
+        self.timings_label = QLabel()
+        self.timings_label.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.timings_label.setStyleSheet("color: #4b5563; font-size: 11px; background: transparent; border: none;")
+        self.timings_label.hide()
+        
+        self.layout().insertWidget(1, self.view)
+        self.layout().insertWidget(2, self.cancel_btn)
+        self.layout().insertWidget(3, self.full_btn)
+        self.layout().insertWidget(4, self.export_btn)
+        self.layout().insertWidget(5, self.timings_btn)
+        self.layout().insertWidget(6, self.timings_label)
+        
+        if worker is None:
+            self.cancel_btn.hide()
+            self.model.finish()
+            return
+        
+        if trace is not None:
+            self.start_trace(trace)
+        self.cancel_btn.clicked.connect(worker.cancel)
+        self.model.fetch_more_requested.connect(worker.fetch_more)
+        worker.progress.connect(self.set_text)
+        worker.columns_ready.connect(self.show_columns)
+        worker.batch_ready.connect(self.add_rows)
+        worker.result_finished.connect(self.finish)
+        worker.error_occurred.connect(self.show_error)
+    
+    def start_trace(self, trace):
+        self.trace = trace
+        self._timing = {
+            "execute": trace.begin("db.execute"),
+            "first_batch": trace.begin("db.first_batch")
+        }
+    
+    def end_trace(self, **attributes):
+        trace, self.trace = self.trace, None
+        if trace is None:
+            return
+        self._timing["execute"]()
+        trace.finish(**attributes)
+        if config_global.get("timings", {}).get("enabled", True):
+            self.set_timings(trace.breakdown())
+        self.trace_finished.emit(trace)
+    
+    def set_timings(self, text):
+        self.timings_label.setText(text)
+        self.timings_btn.show()
+    
+    def toggle_timings(self, shown):
+        self.timings_label.setVisible(shown)
+        self.timings_btn.setText(f"{'▾' if shown else '▸'} Timings")
+    
+    def show_columns(self, columns):
+        if self.trace is not None:
+            self._timing["execute"]()
+        self.cancel_btn.hide()
+        if not columns:
+            self.set_text("✅ Query executed successfully (no rows returned)")
+            return
+        self.set_text("✅ Query executed successfully:")
+        self.model.set_columns(columns)
+        self.view.show()
+    
+    def add_rows(self, rows):
+        first_batch = self.trace is not None and self.model.rowCount() == 0
+        if first_batch:
+            self._timing["first_batch"](rows=len(rows))
+        started = time.perf_counter()
+        self.model.append_rows(rows)
+        self.set_note(f"{self.model.rowCount():,} rows loaded")
+        if first_batch:
+            self.trace.add("ui.rows", time.perf_counter() - started, start=started, rows=len(rows))
+            self.end_trace(rows=len(rows))
+    
+    def run_full(self):
+        # Runs on the connection the preview used
+        if self.full_requested:
+            return
+        self.full_requested = True
+        self.full_btn.hide()
+        self.cancel_btn.show()
+        self.timings_btn.setChecked(False)
+        self.timings_btn.hide()
+        self.start_trace(Trace("query", sql=self.worker.full_query, full=True))
+        if not self.worker.run_full():
+            # The preview had released its connection; the full query runs on a new one
+            self.worker_restarted.emit(self.worker)
+    
+    def finish(self, summary):
+        self.model.finish()
+        self.end_trace(rows=summary["rows_fetched"])
+        if summary.get("preview"):
+            self.full_btn.show()
+        if self.model.columns:
+            self.export_btn.show()
+        if not self.model.columns:
+            return
+        if summary["rows_fetched"] == 0:
+            self.view.hide()
+            self.set_text("No results found.")
+        elif summary.get("preview"):
+            self.set_note(f"Preview, {self.preview_note}: {summary['rows_fetched']:,} rows")
+        elif summary["truncated"]:
+            if summary["total_rows"] is not None:
+                self.set_note(f"Showing {summary['rows_fetched']:,} of {summary['total_rows']:,} rows")
+            else:
+                self.set_note(f"Showing the first {summary['rows_fetched']:,} rows (row cap reached)")
+        elif not summary["exhausted"]:
+            self.set_note(f"{summary['rows_fetched']:,} rows loaded (result closed, re-run for more)")
+        else:
+            self.set_note(f"{summary['rows_fetched']:,} rows")
+    
+    def show_error(self, message):
+        self.model.finish()
+        self.end_trace(error=message)
+        self.cancel_btn.hide()
+        self.full_btn.hide()
+        self.export_btn.hide()
+        self.view.hide()
+        self.set_text(f"❌ {message}")
 
 class ChatTab(QWidget):
     def __init__(self):
@@ -150,22 +341,40 @@ class ChatTab(QWidget):
         header_layout.addWidget(sub)
         layout.addLayout(header_layout)
 
-        # Chat Area
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setFrameShape(QFrame.NoFrame)
-        self.scroll.setMinimumHeight(400)  # Set minimum height
-        self.scroll_content = QWidget()
-        self.chat_layout = QVBoxLayout(self.scroll_content)
-        self.chat_layout.addStretch()
-        self.scroll.setWidget(self.scroll_content)
-        layout.addWidget(self.scroll, 1)  # Add with stretch factor to take available space
+        # Chat Area: a list view over the history, so only the visible bubbles are laid out
+        self.chat_model = ChatHistoryModel()
+        self.chat_delegate = ChatDelegate()
+        self.chat_view = QListView()
+        self.chat_view.setModel(self.chat_model)
+        self.chat_view.setItemDelegate(self.chat_delegate)
+        self.chat_view.setFrameShape(QFrame.NoFrame)
+        self.chat_view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.chat_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.chat_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.chat_view.setResizeMode(QListView.Adjust)
+        self.chat_view.setMinimumHeight(400)  # Set minimum height
+        self.chat_view.setStyleSheet("QListView { background: white; }")
+        # Bubbles grow while they stream; have the view re-measure the changed row
+        self.chat_model.dataChanged.connect(lambda top, bottom: self.chat_delegate.sizeHintChanged.emit(top))
+        layout.addWidget(self.chat_view, 1)  # Add with stretch factor to take available space
         
         # self.model_name = model_name_global
+        self.schema_context = SchemaContext()
+        self.agent = None
+        self.query_cache = None
+        self.history_store = None
+        self.span_log = None
+        self.sql_validator = None
+        self.model_warmer = None
+        self.model_router = None
+        self.query_workers = []  # running QueryWorker threads, kept alive until finished
+        self.preflight_workers = []
+        self.export_workers = []
+        self.live_results = []  # result entries showing a grid, oldest shown first
+        self.requests = {}  # request id -> typing indicator / live bubble of a pending question
 
         # Welcome Message
-        welcome = ChatMessage("Hello! I'm your database assistant. Ask me anything about your data in natural language, and I'll convert it to SQL and retrieve the results for you.")
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, welcome)
+        self.chat_model.add("Hello! I'm your database assistant. Ask me anything about your data in natural language, and I'll convert it to SQL and retrieve the results for you.")
 
         # Input Area
         input_container = QVBoxLayout()
@@ -184,14 +393,32 @@ class ChatTab(QWidget):
         send_btn.clicked.connect(self.send_message)
         send_btn.setStyleSheet("background-color: #111827; color: white; border-radius: 20px; font-size: 18px;")
         
+        self.stop_btn = QPushButton("■")
+        self.stop_btn.setFixedSize(40, 40)
+        self.stop_btn.setCursor(Qt.PointingHandCursor)
+        self.stop_btn.setToolTip("Stop generating")
+        self.stop_btn.clicked.connect(self.stop_generation)
+        self.stop_btn.setStyleSheet("background-color: #ef4444; color: white; border-radius: 20px; font-size: 14px;")
+        self.stop_btn.hide()
+        
         input_row.addWidget(send_btn)
+        input_row.addWidget(self.stop_btn)
+        
+        # Whether the selected model is in memory, i.e. whether the next answer pays for loading it
+        self.model_status = QLabel()
+        self.model_status.setStyleSheet("color: #6b7280; font-size: 11px;")
+        
+        footer_row = QHBoxLayout()
+        footer_row.addWidget(instruction)
+        footer_row.addStretch()
+        footer_row.addWidget(self.model_status)
         
         input_container.addLayout(input_row)
-        input_container.addWidget(instruction)
+        input_container.addLayout(footer_row)
         layout.addLayout(input_container)
 
     def scroll_to_bottom(self):
-        QTimer.singleShot(100, lambda: self.scroll.verticalScrollBar().setValue(self.scroll.verticalScrollBar().maximum()))
+        QTimer.singleShot(100, self.chat_view.scrollToBottom)
 
     def send_message(self):
         text = self.text_input.toPlainText().strip()
@@ -199,143 +426,650 @@ class ChatTab(QWidget):
             return
             
         # Add user message
-        user_msg = ChatMessage(text, is_assistant=False)
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, user_msg)
+        self.chat_model.max_entries = config_global.get("chat", {}).get("max_messages", 500)
+        self.chat_model.add(text, is_assistant=False)
         self.text_input.clear()
         self.scroll_to_bottom()
+        self.ask(text)
         
+    def ask(self, text: str, use_cache: bool = True):
         # Show typing indicator
-        self.typing_indicator = QLabel("Assistant is thinking...")
-        self.typing_indicator.setStyleSheet("color: #6b7280; font-style: italic;")
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, self.typing_indicator)
+        self.typing_indicator = self.chat_model.add("Assistant is thinking...", kind="typing")
         self.scroll_to_bottom()
         
         try:
             if not DBManager:
                 self.show_error("Database not connected")
                 return
-                
-            tables = DBManager.extract_all_tables()
-            schemas = DBManager.describe_all_tables()
             
-            schema_str = ""
-            for table, columns in schemas.items():
-                schema_str += f"\nTable: {table}\n"
-                for col in columns:
-                    schema_str += f"- {col[0]} ({col[1]})\n"
-            print(model_name_global)
-            self.agent = OllamaAgent(
+            trace = Trace("question", model=model_name_global)
+            with trace.span("schema"):
+                schema = DBManager.get_schema()
+            
+            # With routing on, answers are cached for the pair of models, whichever answered
+            router = self.get_model_router()
+            cache_model = router.cache_key if router is not None else model_name_global
+            
+            # Repeat questions are answered from the local cache without calling the model
+            query_cache = self.get_query_cache()
+            if use_cache and query_cache is not None:
+                with trace.span("cache") as attributes:
+                    cached = query_cache.get(text, cache_model, schema["fingerprint"])
+                    attributes["hit"] = cached is not None
+                if cached is not None:
+                    self.remove_typing_indicator()
+                    history_key = self.record_history(question=text, sql=cached[0], model=model_name_global, latency=0.0)
+                    with trace.span("ui.answer"):
+                        sql_msg = self.show_sql_answer(cached[0], question=text, history_key=history_key)
+                        sql_msg.set_note("⚡ served from cache")
+                    self.finish_trace(trace, sql_msg, cached=True)
+                    return
+            
+            with trace.span("schema_context") as attributes:
+                # Only the tables relevant to this question (plus FK neighbours) go into the prompt
+                context_config = config_global.get("schema_context", {})
+                schema_str, tables = self.schema_context.build(
+                    schema, text,
+                    top_k=context_config.get("top_k", 8),
+                    token_budget=context_config.get("token_budget", 3000)
+                )
+                attributes["tables"] = len(tables)
+            
+            # Simple questions go to the small model, which hands over to the large one if its SQL does not validate
+            model_name, escalate_to, notes = model_name_global, None, []
+            if router is not None:
+                decision = router.route(text, tables, schema["tables"])
+                model_name, escalate_to = decision["model"], decision["escalate_to"]
+                trace.attributes["route"] = ", ".join(decision["reasons"]) or "simple"
+                trace.attributes["complexity"] = decision["score"]
+                notes.append(f"🧭 {model_name} ({trace.attributes['route']})")
+            trace.attributes["model"] = model_name
+            
+            # Generated SQL is checked against the schema and sent back to the model when it does not fit
+            validator = self.get_sql_validator()
+            print(model_name)
+            request_id = self.get_agent().submit(
                 query=text,
-                model_name=model_name_global,
+                model_name=model_name,
                 db_schema=schema_str,
-                db_tables=tables
+                db_tables=tables,
+                stream=config_global.get("agent", {}).get("stream", True),
+                all_tables=schema["tables"],
+                schema_fingerprint=schema["fingerprint"],
+                trace=trace,
+                validator=(lambda sql: validator.validate(sql, schema)) if validator is not None else None,
+                max_repairs=config_global.get("validation", {}).get("max_repairs", 2),
+                escalate_to=escalate_to if validator is not None else None
             )
             
-            self.agent.response_received.connect(self.handle_agent_response)
-            self.agent.error_occurred.connect(self.handle_agent_error)
-            self.agent.start()
+            if self.model_warmer is not None:
+                self.model_warmer.mark_used()
+            
+            # The typing indicator now belongs to this request
+            self.requests[request_id] = {
+                "typing_indicator": self.typing_indicator,
+                "live_message": None,
+                "notes": notes,
+                "question": text,
+                "model_name": model_name,
+                "cache_model": cache_model,
+                "fingerprint": schema["fingerprint"],
+                "started": time.perf_counter(),
+                "trace": trace
+            }
+            del self.typing_indicator
+            self.stop_btn.show()
             
         except Exception as e:
             self.show_error(f"Error: {str(e)}")
             self.remove_typing_indicator()
             
-        
-    def handle_agent_response(self, response_type: str, content: str):
-        if response_type == "sql":
-            extracted_content = re.sub(r"```sql|```", "", content).strip()
-            self.remove_typing_indicator()
-            if self.is_sql_query(extracted_content):
-                sql_msg = ChatMessage(extracted_content, is_assistant=True)
-                self.chat_layout.insertWidget(self.chat_layout.count() - 1, sql_msg)
-                self.scroll_to_bottom()
-                
-                container = QWidget()
-                layout = QHBoxLayout(container)
-                
-                execute_btn = QPushButton("Execute Query")
-                execute_btn.clicked.connect(lambda: self.execute_sql_query(extracted_content))
-                
-                copy_btn = QPushButton("Copy SQL")
-                copy_btn.clicked.connect(lambda: QApplication.clipboard().setText(extracted_content))
-                
-                layout.addWidget(execute_btn)
-                layout.addWidget(copy_btn)
+    def get_agent(self):
+        # One long-lived worker thread serves every question
+        if self.agent is None:
+            self.agent = OllamaAgent()
+            self.agent.response_received.connect(self.handle_agent_response)
+            self.agent.token_received.connect(self.handle_agent_token)
+            self.agent.first_token.connect(self.handle_first_token)
+            self.agent.stats_received.connect(self.handle_agent_stats)
+            self.agent.error_occurred.connect(self.handle_agent_error)
+            self.agent.request_cancelled.connect(self.handle_request_cancelled)
+            self.agent.start()
+        self.agent.max_in_flight = config_global.get("agent", {}).get("max_in_flight", 1)
+        self.agent.keep_alive = config_global.get("agent", {}).get("keep_alive", "30m")
+        return self.agent
+    
+    def warm_model(self, model_name: str):
+        """Load model_name in the background (unloading the previous one), see ModelWarmer."""
+        agent_config = config_global.get("agent", {})
+        if not agent_config.get("preload", True) or not model_name:
+            return
+        if self.model_warmer is None:
+            self.model_warmer = ModelWarmer(check_interval=agent_config.get("warm_check_seconds", 60))
+            self.model_warmer.state_changed.connect(self.show_model_state)
+        self.model_warmer.keep_alive = agent_config.get("keep_alive", "30m")
+        self.model_warmer.select(model_name)
+    
+    def show_model_state(self, model_name: str, state: str):
+        text, tooltip = {
+            "loading": (f"⏳ Loading {model_name}...", "The model is being loaded into memory"),
+            "warm": (f"🟢 {model_name} ready", "The model is in memory; answers start right away"),
+            "cold": (f"⚪ {model_name} unloaded", "Unloaded after being idle; the next question loads it again"),
+            "failed": (f"🔴 {model_name} not loaded", "Ollama could not load the model; is it running?")
+        }[state]
+        self.model_status.setText(text)
+        self.model_status.setToolTip(tooltip)
+    
+    def get_model_router(self):
+        """The ModelRouter for the "routing" settings (None when off), kept while they stay the same."""
+        router = router_from_config(config_global, model_name_global)
+        if router is None:
+            self.model_router = None
+        elif self.model_router is None or (
+            (self.model_router.small_model, self.model_router.large_model, self.model_router.threshold)
+            != (router.small_model, router.large_model, router.threshold)
+        ):
+            self.model_router = router
+        return self.model_router
+    
+    def get_sql_validator(self):
+        if not config_global.get("validation", {}).get("enabled", True):
+            return None
+        if self.sql_validator is None or self.sql_validator.db_type != DBManager.db_type:
+            from sqlValidation import SqlValidator  # sqlglot is only loaded once a question is asked
+            self.sql_validator = SqlValidator(DBManager.db_type)
+        return self.sql_validator
+    
+    def get_query_cache(self):
+        cache_config = config_global.get("query_cache", {})
+        if not cache_config.get("enabled", True):
+            return None
+        if self.query_cache is None:
+            self.query_cache = QueryCache(
+                resource_path("query_cache.sqlite"),
+                max_entries=cache_config.get("max_entries", 500),
+                ttl_seconds=cache_config.get("ttl_hours", 168) * 3600,
+                fuzzy_threshold=cache_config.get("fuzzy_threshold")
+            )
+        return self.query_cache
+    
+    def get_history_store(self):
+        if not config_global.get("history", {}).get("enabled", True):
+            return None
+        if self.history_store is None:
+            self.history_store = HistoryStore(resource_path("query_history.sqlite"))
+        return self.history_store
+    
+    def record_history(self, **fields):
+        history_store = self.get_history_store()
+        return history_store.record(**fields) if history_store is not None else None
+    
+    def update_history(self, history_key, **fields):
+        history_store = self.get_history_store()
+        if history_store is not None and history_key is not None:
+            history_store.update(history_key, **fields)
+    
+    def get_span_log(self):
+        timing_config = config_global.get("timings", {})
+        if not timing_config.get("log", True):
+            return None
+        if self.span_log is None:
+            self.span_log = SpanLog(
+                resource_path("timings.jsonl"),
+                max_bytes=timing_config.get("log_max_kb", 1024) * 1024,
+                backups=timing_config.get("log_backups", 3)
+            )
+        return self.span_log
+    
+    def finish_trace(self, trace, entry=None, **attributes):
+        """End a question's trace: attach its breakdown to entry and append it to the timing log."""
+        trace.finish(**attributes)
+        if entry is not None and config_global.get("timings", {}).get("enabled", True):
+            entry.set_details(trace.breakdown())
+        self.log_trace(trace)
+    
+    def log_trace(self, trace):
+        span_log = self.get_span_log()
+        if span_log is not None:
+            span_log.write(trace)
+    
+    def shutdown(self):
+        if self.agent is not None:
+            self.agent.stop()
+            self.agent = None
+        if self.model_warmer is not None:
+            self.model_warmer.shutdown()
+            self.model_warmer = None
+        for worker in list(self.query_workers) + list(self.export_workers):
+            worker.cancel()
+            worker.wait()
+        for worker in list(self.preflight_workers):
+            worker.wait()
+        self.chat_model.clear()  # also removes spilled results
+        if self.history_store is not None:
+            self.history_store.close()
+            self.history_store = None
+        if self.span_log is not None:
+            self.span_log.close()
+            self.span_log = None
+    
+    def finish_request(self, request_id: int):
+        """Forget a request once it is answered; returns None for stale or unknown ids."""
+        state = self.requests.pop(request_id, None)
+        if state is None:
+            return None
+        if state["typing_indicator"] is not None:
+            self.replace_typing_indicator(state, None)
+        if not self.requests:
+            self.stop_btn.hide()
+        return state
+    
+    def replace_typing_indicator(self, state, text):
+        # The request's indicator turns into its answer, so answers stay next to their question
+        indicator = state["typing_indicator"]
+        state["typing_indicator"] = None
+        if text is None:
+            indicator.remove()
+            return None
+        if indicator not in self.chat_model.entries:
+            return self.chat_model.add(text)
+        indicator.kind = "text"
+        indicator.set_text(text)
+        return indicator
+    
+    def ensure_live_message(self, state):
+        # A single bubble that grows in place while the model streams
+        if state["live_message"] is None:
+            state["live_message"] = self.replace_typing_indicator(state, "")
+            self.scroll_to_bottom()
+        return state["live_message"]
+    
+    def handle_agent_token(self, request_id: int, token: str):
+        state = self.requests.get(request_id)
+        if state is not None:
+            self.ensure_live_message(state).append_text(token)
+    
+    def handle_first_token(self, request_id: int, seconds: float):
+        state = self.requests.get(request_id)
+        if state is not None:
+            state["notes"].append(f"first token {seconds:.1f}s")
+            self.ensure_live_message(state).set_note(" · ".join(state["notes"]))
+    
+    def handle_agent_stats(self, request_id: int, stats: dict):
+        # Shows whether the cached prompt prefix was reused: a warm turn only evaluates a few tokens
+        state = self.requests.get(request_id)
+        if state is None:
+            return
+        state["notes"].append(
+            f"prompt {stats.get('prompt_eval_count', 0)} tok in {stats.get('prompt_eval_duration', 0) / 1e9:.2f}s"
+            f" · generation {stats.get('eval_duration', 0) / 1e9:.2f}s"
+        )
+        if state["live_message"] is not None:
+            state["live_message"].set_note(" · ".join(state["notes"]))
+    
+    def stop_generation(self):
+        if self.agent is not None:
+            self.agent.cancel()
+        self.stop_btn.hide()
+    
+    def handle_request_cancelled(self, request_id: int):
+        state = self.requests.get(request_id)
+        if state is None:
+            return
+        if state["live_message"] is not None:
+            state["live_message"].append_text(" …(stopped)")
+        else:
+            self.replace_typing_indicator(state, "⏹ Request cancelled")
+        self.finish_request(request_id)
+        self.finish_trace(state["trace"], cancelled=True)
+    
+    def handle_agent_response(self, request_id: int, response_type: str, content: str):
+        if response_type == "repair":
+            # The model is asked again; its corrected answer streams into the same bubble
+            state = self.requests.get(request_id)
+            if state is None:
+                return
+            # Timings of the rejected answer are dropped, the routing notes stay
+            state["notes"] = [note for note in state["notes"] if note.startswith(("🧭", "⬆"))]
+            state["notes"].append(f"🔧 fixed: {summarize_problems(content)}")
+            if state["live_message"] is not None:
+                state["live_message"].set_text("")
+                state["live_message"].set_note(" · ".join(state["notes"]))
+        elif response_type == "escalate":
+            # The small model's SQL did not validate; the large model (content) answers instead
+            state = self.requests.get(request_id)
+            if state is None:
+                return
+            state["notes"] = [note for note in state["notes"] if note.startswith("🧭")]
+            state["notes"].append(f"⬆ {content}: {state['model_name']}'s SQL did not fit the schema")
+            state["model_name"] = content
+            state["escalated"] = True
+            state["trace"].attributes["model"] = content
+            state["trace"].attributes["escalated"] = True
+            if state["live_message"] is not None:
+                state["live_message"].set_text("")
+                state["live_message"].set_note(" · ".join(state["notes"]))
+        elif response_type == "invalid":
+            state = self.requests.get(request_id)
+            if state is not None:
+                state["invalid"] = True
+                state["notes"] = [note for note in state["notes"] if not note.startswith("🔧")]
+                state["notes"].append(f"⚠ {summarize_problems(content)}")
+        elif response_type == "sql":
+            state = self.finish_request(request_id)
+            if state is None:  # superseded or cancelled
+                return
+            extracted_content = extract_sql(content)
+            # Reuse the streamed bubble instead of adding a second copy of the answer
+            live_message = state["live_message"]
+            history_key = self.record_history(
+                question=state["question"],
+                model=state["model_name"],
+                latency=time.perf_counter() - state["started"]
+            )
+            trace = state["trace"]
+            if is_sql_query(extracted_content):
+                self.update_history(history_key, sql=extracted_content)
+                with trace.span("ui.answer"):
+                    sql_msg = self.show_sql_answer(extracted_content, sql_msg=live_message, history_key=history_key)
+                    if state["notes"]:
+                        sql_msg.set_note(" · ".join(state["notes"]))
                 
-                self.chat_layout.insertWidget(self.chat_layout.count() - 1, container)
-                self.scroll_to_bottom()
+                query_cache = self.get_query_cache()
+                if query_cache is not None and not state.get("invalid"):
+                    query_cache.put(state["question"], state["cache_model"], state["fingerprint"], extracted_content)
+                if self.model_router is not None and state["cache_model"] == self.model_router.cache_key:
+                    self.model_router.record(state["model_name"], trace.total("llm.generate"), escalated=state.get("escalated", False))
+                self.finish_trace(trace, sql_msg)
+            elif live_message is not None:
+                self.update_history(history_key, error="Not a database question")
+                live_message.set_text("Please ask about the database")
+                self.finish_trace(trace, live_message, sql=False)
             else:
-                error_message = ChatMessage("Please ask about the database", is_assistant=True)
-                self.chat_layout.insertWidget(self.chat_layout.count() - 1, error_message)
+                self.update_history(history_key, error="Not a database question")
+                self.chat_model.add("Please ask about the database")
                 self.scroll_to_bottom()
+                self.finish_trace(trace, sql=False)
                 
-    def handle_agent_error(self, error_message: str):
-        self.show_error(f"Agent error: {error_message}")
+    def show_sql_answer(self, sql: str, sql_msg=None, question: str = None, history_key: str = None):
+        """Show sql with its action buttons; question adds a Regenerate button for cached answers."""
+        if sql_msg is not None:
+            sql_msg.set_text(sql)
+        else:
+            sql_msg = self.chat_model.add(sql)
         
-    def execute_sql_query(self, query: str):
-        try:
-            if not DBManager.connect():
-                raise Exception("Not connected to database")
-                
-            # Show executing message
-            executing_msg = ChatMessage("Executing query...", is_assistant=True)
-            self.chat_layout.insertWidget(self.chat_layout.count() - 1, executing_msg)
-            self.scroll_to_bottom()
-            
-            sql = re.sub(r"```sql|```", "", query).strip() # Extract query
-            results = DBManager.query_database(sql)
-            
-            # Display results
-            if isinstance(results, str):  # Error message
-                result_msg = ChatMessage(f"❌ Error: {results}", is_assistant=True)
-            else:
-                if not results:
-                    result_text = "No results found."
-                else:
-                    columns = DBManager.get_last_columns()
-                    
-                    table_rows = []
-                    if columns:
-                        table_rows.append("| " + " | ".join(columns) + " |")
-                        table_rows.append("|" + "|".join(["---"] * len(columns)) + "|")
-                    
-                    for row in results:
-                        table_rows.append("| " + " | ".join(str(cell) for cell in row) + " |")
-                    
-                    result_text = "\n".join(table_rows)
-                
-                result_msg = ChatMessage(f"✅ Query executed successfully:\n\n{result_text}", is_assistant=True)
-            
-            self.chat_layout.insertWidget(self.chat_layout.count() - 1, result_msg)
-            self.scroll_to_bottom()
+        sql_msg.add_action("Execute Query", lambda: self.execute_sql_query(sql, history_key=history_key))
+        sql_msg.add_action("Copy SQL", lambda: QApplication.clipboard().setText(sql))
+        if question is not None:
+            sql_msg.add_action("Regenerate", lambda: self.ask(question, use_cache=False))
+        
+        self.scroll_to_bottom()
+        return sql_msg
+    
+    def handle_agent_error(self, request_id: int, error_message: str):
+        state = self.finish_request(request_id)
+        if state is not None:
+            self.record_history(
+                question=state["question"],
+                model=state["model_name"],
+                latency=time.perf_counter() - state["started"],
+                error=error_message
+            )
+            self.show_error(f"Agent error: {error_message}")
+            self.finish_trace(state["trace"], error=error_message)
+        
+    def execute_sql_query(self, query: str, preflight: bool = True, history_key: str = None):
+        if not DBManager:
+            self.show_error("Database not connected")
+            return
             
-        except Exception as e:
-            error_msg = ChatMessage(f"❌ Error executing query: {str(e)}", is_assistant=True)
-            self.chat_layout.insertWidget(self.chat_layout.count() - 1, error_msg)
+        sql = extract_sql(query)
+        trace = Trace("query", sql=sql)
+        
+        # By default only a preview runs; the full query is one click away on the result
+        preview_sql, preview_note = None, None
+        if config_global.get("preview", {}).get("enabled", True):
+            with trace.span("sql.preview"):
+                preview_sql, preview_note = self.preview_for(sql)
+        
+        preflight_config = config_global.get("preflight", {})
+        if preflight and preflight_config.get("enabled", True) and returns_rows(sql):
+            self.preflight_query(sql, preview_sql, preview_note, preflight_config, history_key, trace)
+        else:
+            self.run_query(sql, preview_sql, preview_note, history_key, trace)
+    
+    def preview_for(self, sql: str):
+        """Return (preview_sql, description) for sql, or (None, None) if it cannot be previewed."""
+        from sqlRewrite import preview_query  # sqlglot, see get_sql_validator
+        preview_config = config_global.get("preview", {})
+        return preview_query(
+            sql,
+            DBManager.db_type,
+            limit=preview_config.get("rows", 100),
+            sample_percent=preview_config.get("sample_percent", 1)
+        )
+    
+    def preflight_query(self, sql: str, preview_sql: str, preview_note: str, preflight_config: dict,
+                        history_key: str = None, trace: Trace = None):
+        """EXPLAIN the statement about to run and only run it straight away when the plan looks cheap."""
+        check_msg = self.chat_model.add("Checking query plan...")
+        self.scroll_to_bottom()
+        trace = trace or Trace("query", sql=sql)
+        end_preflight = trace.begin("db.preflight")
+        
+        def on_plan(summary):
+            end_preflight()
+            warnings = plan_warnings(
+                summary,
+                max_cost=preflight_config.get("max_cost", 1000000),
+                max_rows=preflight_config.get("max_rows", 1000000),
+                scan_rows=preflight_config.get("seq_scan_rows", 100000)
+            )
+            if not warnings:
+                check_msg.remove()
+                self.run_query(sql, preview_sql, preview_note, history_key, trace)
+                return
+            self.show_plan_warning(check_msg, sql, preview_sql, preview_note, warnings, history_key)
+        
+        def on_error(message):
+            # Statements the planner cannot explain just run; real errors surface there
+            print(f"Preflight skipped: {message}")
+            end_preflight(error=message)
+            check_msg.remove()
+            self.run_query(sql, preview_sql, preview_note, history_key, trace)
+        
+        worker = PreflightWorker(DBManager, preview_sql or sql)
+        worker.plan_ready.connect(on_plan)
+        worker.error_occurred.connect(on_error)
+        worker.finished.connect(lambda: self.preflight_workers.remove(worker))
+        self.preflight_workers.append(worker)
+        worker.start()
+    
+    def preflight_full(self, result_msg, sql: str):
+        """EXPLAIN the full query behind a preview before result_msg runs it; the preview's own plan says little."""
+        if result_msg.full_requested:
+            return
+        preflight_config = config_global.get("preflight", {})
+        if not preflight_config.get("enabled", True) or not returns_rows(sql):
+            result_msg.run_full()
+            return
+        result_msg.full_btn.hide()
+        check_msg = self.chat_model.add("Checking query plan...")
+        self.scroll_to_bottom()
+        
+        def on_plan(summary):
+            warnings = plan_warnings(
+                summary,
+                max_cost=preflight_config.get("max_cost", 1000000),
+                max_rows=preflight_config.get("max_rows", 1000000),
+                scan_rows=preflight_config.get("seq_scan_rows", 100000)
+            )
+            if not warnings:
+                check_msg.remove()
+                result_msg.run_full()
+                return
+            check_msg.set_text("⚠️ The full query looks expensive:\n• " + "\n• ".join(warnings))
+            check_msg.add_action("Run anyway", result_msg.run_full)
+            result_msg.full_btn.show()
             self.scroll_to_bottom()
-        finally:
-            pass
         
-    def is_sql_query(self, query: str) -> bool:
-        if not query:
-            return False
-
-        sql_keywords = (
-            "select", "insert", "update", "delete",
-            "create", "drop", "alter", "truncate",
-            "with", "show", "describe", "explain"
+        def on_error(message):
+            print(f"Preflight skipped: {message}")
+            check_msg.remove()
+            result_msg.run_full()
+        
+        worker = PreflightWorker(DBManager, sql)
+        worker.plan_ready.connect(on_plan)
+        worker.error_occurred.connect(on_error)
+        worker.finished.connect(lambda: self.preflight_workers.remove(worker))
+        self.preflight_workers.append(worker)
+        worker.start()
+    
+    def show_plan_warning(self, warning_msg, sql: str, preview_sql: str, preview_note: str, warnings: list,
+                          history_key: str = None):
+        warning_msg.set_text("⚠️ This query looks expensive:\n• " + "\n• ".join(warnings))
+        
+        if preview_sql is None:
+            limited_sql, limited_note = self.preview_for(sql)
+            if limited_sql is not None:
+                warning_msg.add_action(f"Preview ({limited_note})", lambda: self.run_query(sql, limited_sql, limited_note, history_key))
+        warning_msg.add_action("Run anyway", lambda: self.run_query(sql, preview_sql, preview_note, history_key))
+        self.scroll_to_bottom()
+    
+    def run_query(self, sql: str, preview_sql: str = None, preview_note: str = None, history_key: str = None,
+                  trace: Trace = None):
+        """Run sql, or just preview_sql first with a button on the result to run sql in full."""
+        # The query runs on its own connection in a background thread
+        result_config = config_global.get("results", {})
+        guard_config = config_global.get("query_guards", {})
+        worker = QueryWorker(
+            DBManager,
+            preview_sql or sql,
+            batch_size=result_config.get("batch_size", 500),
+            max_rows=result_config.get("max_rows", 100000),
+            count_total=result_config.get("count_total", False),
+            idle_timeout=result_config.get("idle_timeout", 300),
+            statement_timeout=guard_config.get("statement_timeout", 30),
+            read_only=guard_config.get("read_only", True),
+            full_query=sql if preview_sql else None
         )
-
-        query = query.strip().lower()
-        return query.startswith(sql_keywords)
-
+        
+        # Each open result holds a connection; release the oldest ones beyond the limit
+        max_open = result_config.get("max_open_results", 3)
+        for old_worker in self.query_workers[:max(0, len(self.query_workers) - max_open + 1)]:
+            old_worker.close()
+        
+        result_msg = ResultMessage(worker, preview_note=preview_note, trace=trace or Trace("query", sql=sql))
+        result_msg.full_btn.clicked.connect(lambda: self.preflight_full(result_msg, sql))
+        result_msg.export_btn.clicked.connect(lambda: self.export_query(sql))
+        result_msg.trace_finished.connect(self.log_trace)
+        result_msg.worker_restarted.connect(self.query_workers.append)
+        entry = self.show_result_widget(result_msg)
+        result_msg.timings_btn.toggled.connect(lambda *_: entry.changed())
+        
+        # The grid grows once columns arrive; let the list re-measure the row
+        for signal in (worker.columns_ready, worker.result_finished, worker.error_occurred):
+            signal.connect(lambda *_: entry.changed())
+        if history_key is not None:
+            worker.result_finished.connect(lambda summary: self.update_history(history_key, row_count=summary["rows_fetched"], error=None))
+            worker.error_occurred.connect(lambda message: self.update_history(history_key, error=message))
+        worker.finished.connect(lambda: worker in self.query_workers and self.query_workers.remove(worker))
+        worker.finished.connect(self.spill_old_results)
+        self.query_workers.append(worker)
+        worker.start()
+    
+    def export_query(self, sql: str):
+        """Ask for a file and stream the full result of sql into it in the background."""
+        formats = available_formats()
+        path, _filter = QFileDialog.getSaveFileName(
+            self,
+            "Export Query Result",
+            "query_result.csv",
+            ";;".join(f"{name} (*{ext})" for ext, name in formats.items())
+        )
+        if not path:
+            return
+        extension = os.path.splitext(path)[1].lower()
+        if not extension:
+            path += ".csv"
+        elif extension not in formats:
+            self.show_error(f"Cannot export to {extension} files" + (" without pyarrow installed" if extension == ".parquet" else ""))
+            return
+        
+        export_config = config_global.get("export", {})
+        guard_config = config_global.get("query_guards", {})
+        worker = ExportWorker(
+            DBManager,
+            sql,
+            path,
+            batch_size=export_config.get("batch_size", 10000),
+            statement_timeout=export_config.get("statement_timeout", 0),
+            read_only=guard_config.get("read_only", True)
+        )
+        
+        export_msg = self.chat_model.add(f"Exporting to {os.path.basename(path)}...")
+        export_msg.add_action("Cancel", worker.cancel)
+        worker.progress.connect(lambda rows: export_msg.set_note(f"{rows:,} rows written"))
+        worker.export_finished.connect(lambda result: export_msg.set_text(f"✅ Exported {result['rows']:,} rows to {result['path']}"))
+        worker.error_occurred.connect(lambda message: export_msg.set_text(f"❌ {message}"))
+        worker.finished.connect(export_msg.clear_actions)
+        worker.finished.connect(lambda: self.export_workers.remove(worker))
+        self.export_workers.append(worker)
+        self.scroll_to_bottom()
+        worker.start()
+    
+    def show_result_widget(self, result_msg):
+        entry = self.chat_model.add("", kind="result")
+        entry.widget = result_msg
+        self.chat_view.setIndexWidget(self.chat_model.index_of(entry), result_msg)
+        self.live_results.append(entry)
+        self.scroll_to_bottom()
+        return entry
+    
+    def spill_old_results(self):
+        """Swap all but the newest live result grids for compact references backed by a temp file."""
+        keep = config_global.get("results", {}).get("max_open_results", 3)
+        self.live_results = [entry for entry in self.live_results if entry.widget is not None]
+        for entry in self.live_results[:max(0, len(self.live_results) - keep)]:
+            result_msg = entry.widget
+            if result_msg.worker is not None and result_msg.worker.isRunning():
+                continue  # spilled once its worker finishes
+            self.live_results.remove(entry)
+            columns, row_count = result_msg.model.columns, result_msg.model.rowCount()
+            self.chat_view.setIndexWidget(self.chat_model.index_of(entry), None)
+            entry.widget = None
+            if not columns:
+                entry.set_text(result_msg.msg_label.text())
+                continue
+            if entry.spill_path is None:
+                entry.spill_path = spill_rows(columns, result_msg.model.iter_rows())
+                entry.text = f"📄 Result: {row_count:,} rows × {len(columns)} columns ({', '.join(columns[:6])}{', …' if len(columns) > 6 else ''})"
+                entry.note = result_msg.note
+            entry.add_action("Show rows", lambda entry=entry: self.restore_result(entry))
+    
+    def restore_result(self, entry):
+        """Load a spilled result back into a grid (as the newest result)."""
+        if entry.spill_path is None:
+            return
+        columns, rows = load_spilled_rows(entry.spill_path)
+        result_msg = ResultMessage(None)
+        result_msg.show_columns(columns)
+        result_msg.add_rows(rows)
+        result_msg.set_note(entry.note or f"{len(rows):,} rows")
+        entry.clear_actions()
+        entry.widget = result_msg
+        self.chat_view.setIndexWidget(self.chat_model.index_of(entry), result_msg)
+        self.live_results.append(entry)
+        entry.changed()
+        self.spill_old_results()
+        
     def remove_typing_indicator(self):
         if hasattr(self, 'typing_indicator'):
-            self.typing_indicator.deleteLater()
+            self.typing_indicator.remove()
             del self.typing_indicator
             
     def show_error(self, message: str):
-        error_msg = ChatMessage(f"❌ {message}", is_assistant=True)
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, error_msg)
+        self.chat_model.add(f"❌ {message}")
         self.remove_typing_indicator()
         
     def update_status(self, status: str):
@@ -344,7 +1078,103 @@ class ChatTab(QWidget):
                         
             
 
+class HistoryTab(QWidget):
+    """Full-text search over past questions and their SQL, to re-use them without the model."""
+    query_opened = Signal()
+    
+    def __init__(self, chat_tab):
+        super().__init__()
+        self.chat_tab = chat_tab
+        self.results = []
+        
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(30, 20, 30, 20)
+        layout.setSpacing(15)
+        
+        # Header
+        header_layout = QVBoxLayout()
+        title = QLabel("Query History")
+        title.setProperty("class", "Title")
+        sub = QLabel("Search past questions and SQL, then re-run them or bring them back into the chat")
+        sub.setProperty("class", "SubTitle")
+        header_layout.addWidget(title)
+        header_layout.addWidget(sub)
+        layout.addLayout(header_layout)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search questions and SQL...")
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
+        layout.addWidget(self.search_input)
+        
+        # Search once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.refresh)
+        
+        self.result_list = QListWidget()
+        self.result_list.setWordWrap(True)
+        self.result_list.setAlternatingRowColors(True)
+        self.result_list.itemDoubleClicked.connect(lambda: self.insert_selected())
+        layout.addWidget(self.result_list, 1)
+        
+        button_row = QHBoxLayout()
+        insert_btn = QPushButton("Insert into Chat")
+        insert_btn.clicked.connect(self.insert_selected)
+        rerun_btn = QPushButton("Re-run Query")
+        rerun_btn.setObjectName("PrimaryButton")
+        rerun_btn.clicked.connect(self.rerun_selected)
+        button_row.addStretch()
+        button_row.addWidget(insert_btn)
+        button_row.addWidget(rerun_btn)
+        layout.addLayout(button_row)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        history_store = self.chat_tab.get_history_store()
+        if history_store is not None:
+            history_store.flush(timeout=1)
+        self.refresh()
+    
+    def refresh(self):
+        history_store = self.chat_tab.get_history_store()
+        self.result_list.clear()
+        self.results = history_store.search(self.search_input.text()) if history_store is not None else []
+        for entry in self.results:
+            when = datetime.fromtimestamp(entry["created_at"]).strftime("%d %b %I:%M %p")
+            details = [when, entry["model"] or "?"]
+            if entry["row_count"] is not None:
+                details.append(f"{entry['row_count']:,} rows")
+            if entry["error"]:
+                details.append(f"error: {entry['error']}")
+            item = QListWidgetItem(f"{entry['question'] or '(SQL only)'}\n{entry['sql'] or '—'}\n{' · '.join(details)}")
+            item.setToolTip(entry["sql"] or entry["error"] or "")
+            self.result_list.addItem(item)
+    
+    def selected_entry(self):
+        row = self.result_list.currentRow()
+        return self.results[row] if 0 <= row < len(self.results) else None
+    
+    def insert_selected(self):
+        """Show the past question and its SQL in the chat again, without asking the model."""
+        entry = self.selected_entry()
+        if entry is None or not entry["sql"]:
+            return None
+        if entry["question"]:
+            self.chat_tab.chat_model.add(entry["question"], is_assistant=False)
+        sql_msg = self.chat_tab.show_sql_answer(entry["sql"], question=entry["question"], history_key=entry["key"])
+        sql_msg.set_note("🕘 from history")
+        self.query_opened.emit()
+        return entry
+    
+    def rerun_selected(self):
+        entry = self.insert_selected()
+        if entry is not None:
+            self.chat_tab.execute_sql_query(entry["sql"], history_key=entry["key"])
+
 class SettingsTab(QWidget):
+    model_changed = Signal(str)  # a model was picked from the list
+    
     def __init__(self):
         super().__init__()
         layout = QVBoxLayout(self)
@@ -353,14 +1183,16 @@ class SettingsTab(QWidget):
         
         self.is_db_connected = False
         self.model = None
+        self.available_models = []
         self.config = {}
         
         self.load_settings()
         self.setup_ui()
         self.load_settings_to_ui()
         
-        global model_name_global
+        global model_name_global, config_global
         model_name_global = self.config["model"]["name"]
+        config_global = self.config
 
         # Header
         header_layout = QVBoxLayout()
@@ -443,8 +1275,18 @@ class SettingsTab(QWidget):
         
         self.connect_btn.clicked.connect(self.connect_db)
         
+        refresh_schema_btn = QPushButton("Refresh Schema")
+        refresh_schema_btn.setObjectName("PrimaryButton")
+        refresh_schema_btn.setFixedWidth(150)
+        refresh_schema_btn.clicked.connect(self.refresh_schema)
+        
+        db_buttons = QHBoxLayout()
+        db_buttons.addWidget(self.connect_btn)
+        db_buttons.addWidget(refresh_schema_btn)
+        db_buttons.addStretch()
+        
         db_layout.addSpacing(10)
-        db_layout.addWidget(self.connect_btn)
+        db_layout.addLayout(db_buttons)
         
         layout.addWidget(db_group)
 
@@ -477,11 +1319,10 @@ class SettingsTab(QWidget):
         choose_model_lbl = QLabel("Choose Model: ")
         choose_model_lbl.setStyleSheet("color: #374151; font-weight: 500;")
         
-        models = ["Select Model"]
-        models.extend(self.list_ollama_models())
-        
-        self.choose_model_edit.addItems(models)
+        # Filled in once Ollama answers, so the window does not wait for it
+        self.choose_model_edit.setPlaceholderText("Loading models...")
         self.choose_model_edit.currentIndexChanged.connect(lambda: self.update_model(self.choose_model_edit.currentText()))
+        self.list_ollama_models()
         
         
         pull_models_ins = QLabel("Pull models using 'ollama pull <model_name>' command in terminal.")
@@ -508,6 +1349,8 @@ class SettingsTab(QWidget):
     def update_model(self, model_name):
         global model_name_global
         model_name_global = model_name
+        if model_name in self.available_models:
+            self.model_changed.emit(model_name)
     
     def setup_ui(self):
         self.db_type_input = QLineEdit()
@@ -532,13 +1375,19 @@ class SettingsTab(QWidget):
     def connect_db(self):
         print("Connecting to DB...")
         global DBManager
+        pool_config = self.config.get("pool", {})
         DBManager = DatabaseManager(
             db_type=self.db_type_input.text().strip(),
             db_name=self.db_name_input.text().strip(),
             host=self.host_input.text().strip(),
             port=self.port_input.text().strip(),
             username=self.username_input.text().strip(),
-            password=self.password_input.text().strip()
+            password=self.password_input.text().strip(),
+            pool_size=pool_config.get("size", 5),
+            max_overflow=pool_config.get("max_overflow", 5),
+            pool_recycle=pool_config.get("recycle", 1800),
+            pool_timeout=pool_config.get("timeout", 30),
+            idle_timeout=pool_config.get("idle_timeout", 300)
         )
         flag = DBManager.connect()
         if flag:
@@ -550,6 +1399,16 @@ class SettingsTab(QWidget):
         else:
             QMessageBox.information(self, "Database Connection", "Failed to connect with database")
     
+    def refresh_schema(self):
+        if not DBManager:
+            QMessageBox.information(self, "Refresh Schema", "Database not connected")
+            return
+        try:
+            schema = DBManager.refresh_schema()
+            QMessageBox.information(self, "Refresh Schema", f"Schema refreshed: {len(schema['tables'])} tables")
+        except Exception as e:
+            QMessageBox.information(self, "Refresh Schema", f"Failed to refresh schema: {str(e)}")
+    
     def check_ollama_installed(self):
         try:
             result = subprocess.run(["cmd", "/c", "ollama", "--version"], capture_output=True, text=True)
@@ -561,37 +1420,46 @@ class SettingsTab(QWidget):
         except FileNotFoundError:
             print("Ollama command not found. Please install Ollama.")
     
-    def list_ollama_models(self) -> list[str]:
-        try:
-            result = subprocess.run(["cmd", "/c", "ollama", "list"], capture_output=True, text=True)
-            if result.returncode == 0:
-                print("Available Ollama models:\n", extract_model_names(result.stdout))
-                
-                return extract_model_names(result.stdout)
-            else:
-                print("Failed to list Ollama models.")
-                return ["Failed to list models"]
-        except FileNotFoundError:
-            print("Ollama command not found. Please install Ollama.")
-            return ["Ollama not found"]
+    def list_ollama_models(self):
+        self.model_list_worker = ModelListWorker()
+        self.model_list_worker.models_loaded.connect(self.show_ollama_models)
+        self.model_list_worker.failed.connect(self.show_ollama_models_failed)
+        self.model_list_worker.start()
+    
+    def show_ollama_models(self, models):
+        print("Available Ollama models:\n", models)
+        self.available_models = models
+        self.set_model_items(models)
+    
+    def show_ollama_models_failed(self, error):
+        print(f"Failed to list Ollama models: {error}")
+        self.set_model_items(["Ollama not running"])
+    
+    def set_model_items(self, models):
+        # Refilling the list must not change the selected model
+        self.choose_model_edit.blockSignals(True)
+        self.choose_model_edit.clear()
+        self.choose_model_edit.addItems(["Select Model"] + models)
+        self.choose_model_edit.setCurrentText(model_name_global)
+        self.choose_model_edit.blockSignals(False)
         
     def save_settings(self):
         try:
             self.model = self.choose_model_edit.currentText().strip()
             settings_path = resource_path("settings.json")
             with open(settings_path, "w") as f:
-                config = {
-                    "database" : {
-                        "type" : self.db_type_input.text().strip(),
-                        "name" : self.db_name_input.text().strip(),
-                        "host" : self.host_input.text().strip(),
-                        "port" : self.port_input.text().strip(),
-                        "username" : self.username_input.text().strip(),
-                        "password" : self.password_input.text().strip()
-                    },
-                    "model" : {
-                        "name" : self.model
-                    }
+                # Keep any other sections (e.g. "schema_context") that were edited by hand
+                config = self.config
+                config["database"] = {
+                    "type" : self.db_type_input.text().strip(),
+                    "name" : self.db_name_input.text().strip(),
+                    "host" : self.host_input.text().strip(),
+                    "port" : self.port_input.text().strip(),
+                    "username" : self.username_input.text().strip(),
+                    "password" : self.password_input.text().strip()
+                }
+                config["model"] = {
+                    "name" : self.model
                 }
                 json.dump(config, f, indent=4)
             QMessageBox.information(self, "Save Settings", "Configurations saved successfully")
@@ -615,31 +1483,42 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         # self.chat_tab = ChatTab(model_name="gemma3:1b")
         # self.tabs.addTab(self.chat_tab, "Chat")
-        self.tabs.addTab(ChatTab(), "Chat")
-        self.tabs.addTab(SettingsTab(), "Settings")
+        self.chat_tab = ChatTab()
+        self.tabs.addTab(self.chat_tab, "Chat")
+        self.history_tab = HistoryTab(self.chat_tab)
+        self.history_tab.query_opened.connect(lambda: self.tabs.setCurrentWidget(self.chat_tab))
+        self.tabs.addTab(self.history_tab, "History")
+        self.settings_tab = SettingsTab()
+        self.settings_tab.model_changed.connect(self.chat_tab.warm_model)
+        self.tabs.addTab(self.settings_tab, "Settings")
+        # The model from settings.json is loaded once the window is up
+        QTimer.singleShot(0, lambda: self.chat_tab.warm_model(model_name_global))
         
         self.setCentralWidget(self.tabs)
         self.setStyleSheet(STYLE_SHEET)
+    
+    def closeEvent(self, event):
+        self.chat_tab.shutdown()
+        super().closeEvent(event)
 
-def extract_model_names(output: str):
-    lines = output.strip().splitlines()
-    models = []
-
-    for line in lines[1:]:  # skip header
-        parts = line.split()
-        if parts:
-            models.append(parts[0])
-
-    return models
+def summarize_problems(problems):
+    lines = problems.splitlines()
+    return lines[0] + (f" (+{len(lines) - 1} more)" if len(lines) > 1 else "")
 
 def resource_path(path):
     if hasattr(sys, "_MEIPASS"):
         return os.path.join(sys._MEIPASS, path)
     return os.path.join(os.path.abspath("."), path)
 
+def startup_times():
+    """Seconds from the start of app.py to the end of its imports, and to now (call after the first paint)."""
+    return {"imports": IMPORTED_AT - STARTED_AT, "window": time.perf_counter() - STARTED_AT}
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setWindowIcon(QtGui.QIcon(os.path.join(basedir, 'logo.ico')))
     window = MainWindow()
     window.show()
+    # Runs once the shown window has been painted; nothing before it waits on Ollama or the database
+    QTimer.singleShot(0, lambda: print("⏱ Startup: imports {imports:.2f}s, window painted after {window:.2f}s".format(**startup_times())))
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllamaServer:
+    """Stand-in for a local Ollama server that answers every chat with canned SQL.
+
+    latency is the wait before the first token (the prompt evaluation of a real model)
+    and token_delay the wait between streamed tokens. Only the endpoints QueryMind
+    uses are served: /api/chat (streamed or not), /api/tags, and /api/generate and
+    /api/ps for loading, unloading and listing models in memory. load_time is how long
+    loading a model takes; a chat with a model that is not loaded pays it first.
+
+    sql may also be a list of answers: a conversation that already holds n answers
+    (repair requests) gets the answer at index n, or the last one.
+    """
+    def __init__(self, sql="SELECT 1;", latency=0.2, token_delay=0.01, models=("bench:latest",), load_time=0.0):
+        self.sql = sql
+        self.latency = latency
+        self.token_delay = token_delay
+        self.models = list(models)
+        self.load_time = load_time
+        self.loaded = set()
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def load(self, model):
+        """Load model if it is not in memory yet; returns the seconds that took."""
+        if model in self.loaded:
+            return 0.0
+        time.sleep(self.load_time)
+        self.loaded.add(model)
+        return self.load_time
+
+    def answer(self, request):
+        if isinstance(self.sql, str):
+            return self.sql
+        turn = sum(message.get("role") == "assistant" for message in request.get("messages", []))
+        return self.sql[min(turn, len(self.sql) - 1)]
+
+    def tokens(self, sql):
+        # Roughly how a model streams SQL: one word (with its trailing space) per chunk
+        words = sql.split(" ")
+        return [word + " " for word in words[:-1]] + [words[-1]]
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                if path == "/api/tags":
+                    return self.send_json({"models": [{"name": name, "model": name, "size": 0} for name in fake.models]})
+                if path == "/api/ps":
+                    return self.send_json({"models": [{"name": name, "model": name} for name in sorted(fake.loaded)]})
+                self.send_error(404)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                request = json.loads(body or b"{}")
+                model = request.get("model", "")
+                if self.path.rstrip("/") == "/api/generate" and not request.get("prompt"):
+                    if request.get("keep_alive") == 0:
+                        fake.loaded.discard(model)
+                        return self.send_json(chunk(model, "", done=True, reason="unload"))
+                    fake.load(model)
+                    return self.send_json(chunk(model, "", done=True, reason="load"))
+                if self.path.rstrip("/") != "/api/chat":
+                    return self.send_error(404)
+                fake.requests += 1
+                load_seconds = fake.load(model)
+                started = time.perf_counter()
+                time.sleep(fake.latency)
+                prompt_done = time.perf_counter()
+                sql = fake.answer(request)
+                if request.get("stream", True):
+                    self.stream_chat(model, sql, request, started, prompt_done, load_seconds)
+                else:
+                    time.sleep(fake.token_delay * len(fake.tokens(sql)))
+                    self.send_json(dict(
+                        chunk(model, sql, done=True),
+                        **stats(started, prompt_done, request, fake.tokens(sql), load_seconds)
+                    ))
+
+            def stream_chat(self, model, sql, request, started, prompt_done, load_seconds):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in fake.tokens(sql):
+                        self.write_chunk(chunk(model, token))
+                        time.sleep(fake.token_delay)
+                    self.write_chunk(dict(chunk(model, "", done=True), **stats(started, prompt_done, request, fake.tokens(sql), load_seconds)))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped reading, like a cancelled request
+
+            def write_chunk(self, payload):
+                data = json.dumps(payload).encode() + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def send_json(self, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def chunk(model, content, done=False, reason=None):
+    payload = {
+        "model": model,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": content},
+        "done": done
+    }
+    if reason is not None:
+        payload["done_reason"] = reason
+    return payload
+
+
+def stats(started, prompt_done, request, tokens, load_seconds=0.0):
+    """The timing counters Ollama adds to its final chunk, in nanoseconds."""
+    finished = time.perf_counter()
+    prompt = "".join(message.get("content", "") for message in request.get("messages", []))
+    return {
+        "done_reason": "stop",
+        "total_duration": int((finished - started + load_seconds) * 1e9),
+        "load_duration": int(load_seconds * 1e9),
+        "prompt_eval_count": len(prompt) // 4 + 1,
+        "prompt_eval_duration": int((prompt_done - started) * 1e9),
+        "eval_count": len(tokens),
+        "eval_duration": int((finished - prompt_done) * 1e9)
+    }
@@ -0,0 +1,435 @@
+"""End-to-end benchmarks for QueryMind, runnable headless on Linux.
+
+Starts a fake Ollama server (canned SQL, configurable latency) and seeds SQLite
+databases with synthetic schemas of 10, 100 and 1000 tables, then times each stage
+a question goes through: schema introspection, prompt construction, the LLM round
+trip, query execution, result formatting and rendering (Qt offscreen platform),
+for DatabaseManager, OllamaAgent and ChatTab, plus the app's startup time. Results are written to a JSON file
+so runs on different commits can be compared:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from fake_ollama import FakeOllamaServer
+from sqlite_db import SQLiteDatabaseManager, seed_database
+
+QUESTION = "What are the biggest paid orders per customer this year?"
+CANNED_SQL = "SELECT id, customer_id, status, amount, created_at FROM orders WHERE status = 'paid' ORDER BY amount DESC;"
+MODEL = "bench:latest"
+
+
+class Results:
+    def __init__(self):
+        self.entries = []
+
+    def add(self, name, timings, tables=None, **extra):
+        entry = {
+            "benchmark": name,
+            "tables": tables,
+            "runs": len(timings),
+            "median_ms": statistics.median(timings) * 1000,
+            "mean_ms": statistics.fmean(timings) * 1000,
+            "min_ms": min(timings) * 1000,
+            "max_ms": max(timings) * 1000,
+            "stdev_ms": statistics.stdev(timings) * 1000 if len(timings) > 1 else 0.0,
+        }
+        entry.update(extra)
+        self.entries.append(entry)
+        label = name if tables is None else f"{name} [{tables} tables]"
+        print(f"{label:<44} {entry['median_ms']:>10.2f} ms  (min {entry['min_ms']:.2f}, max {entry['max_ms']:.2f})", file=sys.stderr)
+        return entry
+
+
+def measure(function, repeat, warmup=1):
+    """Call function warmup + repeat times and return the wall time of the timed calls."""
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_until(condition, timeout=60):
+    """Run the Qt event loop until condition() holds (checked every millisecond)."""
+    from PySide6.QtCore import QEventLoop, QTimer
+
+    if condition():
+        return
+    loop = QEventLoop()
+    timer = QTimer()
+    timer.setInterval(1)
+    deadline = time.monotonic() + timeout
+
+    def check():
+        if condition() or time.monotonic() > deadline:
+            loop.quit()
+
+    timer.timeout.connect(check)
+    timer.start()
+    loop.exec()
+    timer.stop()
+    if not condition():
+        raise TimeoutError("Benchmark step did not finish in time")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_database(results, manager, tables, repeat):
+    results.add("db.schema_fingerprint", measure(manager.schema_fingerprint, repeat), tables)
+    results.add("db.schema_introspection", measure(lambda: manager.get_schema(force_refresh=True), repeat), tables)
+    results.add("db.schema_cached", measure(manager.get_schema, repeat), tables)
+
+
+def bench_prompt(results, schema, tables, repeat):
+    from modelRouter import ModelRouter
+    from promptBuilder import PromptBuilder
+    from schemaIndex import SchemaIndex
+    from sqlValidation import SqlValidator
+
+    results.add("prompt.schema_index", measure(lambda: SchemaIndex(schema), repeat), tables)
+    index = SchemaIndex(schema)
+    schema_str, selected = index.build_context(QUESTION)
+    results.add("prompt.build_context", measure(lambda: index.build_context(QUESTION), repeat), tables,
+                selected_tables=len(selected))
+
+    prompts = PromptBuilder()
+    request = {
+        "query": QUESTION,
+        "model_name": MODEL,
+        "db_schema": schema_str,
+        "db_tables": selected,
+        "all_tables": schema["tables"],
+        "schema_fingerprint": schema["fingerprint"]
+    }
+
+    def build_cold():
+        prompts._system_prompts.clear()
+        return prompts.build_messages(request)
+
+    messages = build_cold()
+    results.add("prompt.build_messages", measure(build_cold, repeat), tables,
+                prompt_chars=sum(len(message["content"]) for message in messages))
+    results.add("prompt.build_messages_warm", measure(lambda: prompts.build_messages(request), repeat), tables)
+
+    validator = SqlValidator("sqlite")
+    results.add("prompt.validate_sql", measure(lambda: validator.validate(CANNED_SQL, schema), repeat), tables)
+
+    router = ModelRouter(MODEL, MODEL + "-large")
+    results.add("prompt.route", measure(lambda: router.route(QUESTION, selected, schema["tables"]), repeat), tables)
+
+
+def bench_agent(results, schema, tables, repeat):
+    from agent import OllamaAgent
+    from schemaIndex import SchemaIndex
+
+    schema_str, selected = SchemaIndex(schema).build_context(QUESTION)
+    agent = OllamaAgent()
+    done = {}
+    first_tokens = []
+    agent.first_token.connect(lambda request_id, seconds: first_tokens.append(seconds))
+    agent.response_received.connect(lambda request_id, kind, content: done.__setitem__(request_id, kind) if kind == "complete" else None)
+    agent.error_occurred.connect(lambda request_id, message: done.__setitem__(request_id, message))
+    agent.start()
+    try:
+        def round_trip():
+            request_id = agent.submit(QUESTION, MODEL, schema_str, selected, stream=True,
+                                      all_tables=schema["tables"], schema_fingerprint=schema["fingerprint"])
+            run_until(lambda: request_id in done)
+            if done[request_id] != "complete":
+                raise RuntimeError(done[request_id])
+
+        timings = measure(round_trip, repeat)
+        first_tokens = first_tokens[-repeat:]
+        results.add("agent.first_token", first_tokens, tables)
+        results.add("agent.round_trip", timings, tables)
+    finally:
+        agent.stop()
+
+
+def bench_execution(results, manager, repeat):
+    query = "SELECT * FROM orders"
+    first_batch = []
+
+    def stream_all():
+        started = time.perf_counter()
+        with manager.stream_query(query, batch_size=500, statement_timeout=30, read_only=True) as stream:
+            rows = len(stream.fetch())
+            first_batch.append(time.perf_counter() - started)
+            for batch in stream:
+                rows += len(batch)
+        return rows
+
+    rows = stream_all()
+    first_batch.clear()
+    timings = measure(stream_all, repeat, warmup=0)
+    results.add("db.stream_first_batch", first_batch, rows=rows)
+    results.add("db.stream_all", timings, rows=rows)
+    results.add("db.query_database", measure(lambda: manager.query_database(query), repeat), rows=rows)
+    return manager.query_database(query), manager.get_last_columns()
+
+
+def bench_formatting(results, rows, columns, repeat):
+    from resultModel import ResultTableModel
+    from PySide6.QtCore import Qt
+
+    def load_and_format():
+        model = ResultTableModel()
+        model.set_columns(columns)
+        for start in range(0, len(rows), 500):
+            model.append_rows(rows[start:start + 500])
+        for row in range(model.rowCount()):
+            for column in range(model.columnCount()):
+                model.data(model.index(row, column), Qt.DisplayRole)
+        return model
+
+    results.add("format.rows", measure(load_and_format, repeat), rows=len(rows))
+
+
+def bench_rendering(results, chat_tab, app_module, rows, columns, repeat):
+    from PySide6.QtWidgets import QApplication
+
+    chat_tab.chat_model.clear()
+    for index in range(200):
+        chat_tab.chat_model.add(f"Question {index}: {QUESTION}", is_assistant=False)
+        chat_tab.chat_model.add(CANNED_SQL)
+    QApplication.processEvents()
+
+    def paint_chat():
+        chat_tab.chat_delegate._heights.clear()
+        chat_tab.chat_view.doItemsLayout()
+        chat_tab.chat_view.grab()
+
+    results.add("render.chat_400_messages", measure(paint_chat, repeat), messages=len(chat_tab.chat_model.entries))
+
+    def paint_result():
+        result_msg = app_module.ResultMessage(None)
+        result_msg.show_columns(columns)
+        result_msg.add_rows(rows)
+        result_msg.resize(800, 400)
+        result_msg.grab()
+        result_msg.deleteLater()
+
+    results.add("render.result_grid", measure(paint_result, repeat), rows=len(rows))
+    chat_tab.chat_model.clear()
+    QApplication.processEvents()
+
+
+def bench_chat(results, chat_tab, tables, repeat):
+    """One question through ChatTab: ask -> SQL bubble -> Execute Query -> result grid painted."""
+    from PySide6.QtWidgets import QApplication
+
+    stages = {"chat.answer": [], "chat.execute": [], "chat.render": []}
+
+    def ask_and_run():
+        started = time.perf_counter()
+        chat_tab.text_input.setPlainText(QUESTION)
+        chat_tab.send_message()
+        run_until(lambda: not chat_tab.requests)
+        answered = time.perf_counter()
+
+        entry = chat_tab.chat_model.entries[-1]
+        execute = dict(entry.actions).get("Execute Query")
+        if execute is None:
+            raise RuntimeError(f"No SQL answer: {entry.text}")
+        execute()
+        result_msg = chat_tab.live_results[-1].widget
+        run_until(lambda: not result_msg.model.has_more)
+        executed = time.perf_counter()
+        if result_msg.msg_label.text().startswith("❌"):
+            raise RuntimeError(result_msg.msg_label.text())
+
+        QApplication.processEvents()
+        chat_tab.grab()
+        rendered = time.perf_counter()
+
+        stages["chat.answer"].append(answered - started)
+        stages["chat.execute"].append(executed - answered)
+        stages["chat.render"].append(rendered - executed)
+
+        # Release the result's connection before the next question
+        chat_tab.chat_model.clear()
+        run_until(lambda: not chat_tab.query_workers)
+
+    timings = measure(ask_and_run, repeat)
+    for name, values in stages.items():
+        results.add(name, values[-repeat:], tables)
+    results.add("chat.end_to_end", timings, tables)
+
+
+STARTUP_SCRIPT = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import app
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+qt_app = QApplication([])
+window = app.MainWindow()
+window.show()
+QTimer.singleShot(0, lambda: (print(json.dumps(app.startup_times())), window.close(), qt_app.quit()))
+qt_app.exec()
+"""
+
+
+def bench_startup(results, workdir, ollama_url, repeat):
+    """Launch the app in a fresh interpreter repeat times: imports done, and first window painted."""
+    with open(os.path.join(workdir, "settings.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "database": {"type": "postgresql", "name": "", "host": "", "port": "", "username": "", "password": ""},
+            "model": {"name": MODEL}
+        }, f)
+    env = dict(os.environ, OLLAMA_HOST=ollama_url, QT_QPA_PLATFORM="offscreen")
+    stages = {"startup.imports": [], "startup.first_paint": []}
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, ROOT], cwd=workdir, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        times = json.loads(output.strip().splitlines()[-1])
+        stages["startup.imports"].append(times["imports"])
+        stages["startup.first_paint"].append(times["window"])
+    for name, values in stages.items():
+        results.add(name, values)
+
+
+def compare(current, current_meta, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {(entry["benchmark"], entry["tables"]): entry["median_ms"] for entry in baseline["results"]}
+    print(f"\nCompared with {baseline['meta'].get('commit')} (median):", file=sys.stderr)
+    settings = ("sizes", "repeat", "rows", "llm_latency", "token_delay")
+    changed = [name for name in settings if baseline["meta"].get(name) != current_meta.get(name)]
+    if changed:
+        print(f"(run with different settings: {', '.join(changed)})", file=sys.stderr)
+    for entry in current:
+        old = before.get((entry["benchmark"], entry["tables"]))
+        if not old:
+            continue
+        change = (entry["median_ms"] - old) / old * 100
+        label = entry["benchmark"] if entry["tables"] is None else f"{entry['benchmark']} [{entry['tables']} tables]"
+        print(f"{label:<44} {old:>10.2f} -> {entry['median_ms']:>10.2f} ms  {change:+6.1f}%", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark QueryMind end to end against a fake Ollama server and SQLite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="schema sizes in tables")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--rows", type=int, default=20000, help="rows in the orders table that is queried")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds before the fake model's first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between streamed tokens")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to print the change against")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's own console output")
+    args = parser.parse_args(argv)
+
+    server = FakeOllamaServer(CANNED_SQL, latency=args.llm_latency, token_delay=args.token_delay, models=[MODEL]).start()
+    # The ollama client reads its host once, on import
+    os.environ["OLLAMA_HOST"] = server.url
+
+    from PySide6.QtWidgets import QApplication
+    qt_app = QApplication.instance() or QApplication([])
+    import app as app_module
+    from PySide6 import __version__ as pyside_version
+
+    app_module.model_name_global = MODEL
+    app_module.config_global.clear()
+    app_module.config_global.update({
+        "query_cache": {"enabled": False},
+        "history": {"enabled": False},
+        "preflight": {"enabled": False},
+        "timings": {"log": False},
+        "agent": {"stream": True}
+    })
+
+    results = Results()
+    chat_tab = None
+    with contextlib.ExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="querymind_bench_"))
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        try:
+            bench_startup(results, workdir, server.url, args.repeat)
+            chat_tab = app_module.ChatTab()
+            chat_tab.resize(900, 700)
+            chat_tab.show()
+            qt_app.processEvents()
+
+            for index, tables in enumerate(args.sizes):
+                path = os.path.join(workdir, f"schema_{tables}.sqlite")
+                seed_database(path, tables, rows=args.rows)
+                manager = SQLiteDatabaseManager(path)
+                if not manager.connect():
+                    raise RuntimeError(f"Could not open {path}")
+                try:
+                    bench_database(results, manager, tables, args.repeat)
+                    schema = manager.get_schema()
+                    bench_prompt(results, schema, tables, args.repeat)
+                    bench_agent(results, schema, tables, args.repeat)
+                    if index == 0:
+                        # Independent of the schema size, so measured once
+                        rows, columns = bench_execution(results, manager, args.repeat)
+                        bench_formatting(results, rows, columns, args.repeat)
+                        bench_rendering(results, chat_tab, app_module, rows, columns, args.repeat)
+                    app_module.DBManager = manager
+                    chat_tab.schema_context.index = None
+                    bench_chat(results, chat_tab, tables, args.repeat)
+                finally:
+                    app_module.DBManager = None
+                    manager.close()
+        finally:
+            if chat_tab is not None:
+                chat_tab.shutdown()
+            server.stop()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pyside": pyside_version,
+            "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+            "rows": args.rows,
+            "llm_latency": args.llm_latency,
+            "token_delay": args.token_delay,
+            "fake_ollama_requests": server.requests
+        },
+        "results": results.entries
+    }
+    path = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {path}", file=sys.stderr)
+
+    if args.compare:
+        compare(results.entries, report["meta"], args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import random
+import re
+import sqlite3
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from dbManager import DatabaseManager
+
+ENTITIES = (
+    "customer", "order", "product", "invoice", "payment", "shipment", "supplier", "employee",
+    "warehouse", "category", "review", "refund", "campaign", "account", "ticket", "subscription"
+)
+STATUSES = ("new", "paid", "shipped", "cancelled", "returned")
+
+
+class SQLiteCursor:
+    """DB-API cursor with the driver conventions DatabaseManager relies on.
+
+    Accepts %s placeholders and works as a context manager, like the psycopg2 and
+    pymysql cursors. SQLite has no statement timeout or read-only transactions, so
+    the SET / START TRANSACTION statements of the query guards are accepted and ignored.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params=None):
+        if query.lstrip().upper().startswith(("SET ", "START TRANSACTION")):
+            return self
+        self.cursor.execute(query.replace("%s", "?"), tuple(params or ()))
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self, *args, **kwargs):
+        # Server-side cursor arguments (SSCursor, name=...) do not apply; SQLite steps lazily anyway
+        return SQLiteCursor(self.connection.cursor())
+
+    def cancel(self):
+        self.connection.interrupt()
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """DatabaseManager over a local SQLite file, for benchmarks without a database server.
+
+    Connections still come from a SQLAlchemy QueuePool and queries still go through
+    QueryStream; only the catalog queries are SQLite's.
+    """
+    def __init__(self, path, **kwargs):
+        super().__init__(path, "localhost", 0, "", "", db_type="sqlite", **kwargs)
+        self.path = path
+
+    def create_engine(self):
+        return create_engine(
+            "sqlite://",
+            creator=lambda: SQLiteConnection(self.path),
+            poolclass=QueuePool,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow
+        )
+
+    def open_direct_connection(self):
+        return SQLiteConnection(self.path)
+
+    def introspection_queries(self):
+        columns_query = """
+            SELECT m.name, p.name, p.type, CASE WHEN p."notnull" THEN 'NO' ELSE 'YES' END, '', ''
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table'
+            ORDER BY m.name, p.cid
+        """
+        keys_query = """
+            SELECT m.name, p.name, 'p', NULL, NULL
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND p.pk > 0
+            UNION ALL
+            SELECT m.name, f."from", 'f', f."table", f."to"
+            FROM sqlite_master m
+            JOIN pragma_foreign_key_list(m.name) f
+            WHERE m.type = 'table'
+        """
+        return columns_query, keys_query
+
+    def fingerprint_query(self):
+        # Bumped by SQLite on every schema change
+        return "SELECT schema_version FROM pragma_schema_version"
+
+    def explain_query(self, query):
+        """EXPLAIN QUERY PLAN reduced to the plan summary of the other databases.
+
+        SQLite has no cost or row estimates, so only full_scans is filled in: every SCAN
+        of a table, sized by the table's row count.
+        """
+        import sqlglot
+        from sqlglot import exp
+        from sqlglot.errors import SqlglotError
+
+        query = re.sub(r";\s*$", "", query.strip())
+        try:
+            # The plan names aliased tables by their alias
+            tables = {table.alias_or_name.lower(): table.name for table in sqlglot.parse_one(query, read="sqlite").find_all(exp.Table)}
+        except SqlglotError:
+            tables = {}
+        full_scans = []
+        with self.checkout() as connection, connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}")
+            for detail in [row[3] for row in cursor.fetchall()]:
+                match = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+                if not match or detail.startswith("SCAN CONSTANT ROW"):
+                    continue
+                table = tables.get(match.group(1).lower(), match.group(1))
+                try:
+                    cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+                except sqlite3.Error:
+                    continue  # a CTE or view materialized by the plan, not a stored table
+                full_scans.append((table, cursor.fetchone()[0]))
+        return {"total_cost": None, "estimated_rows": None, "full_scans": full_scans}
+
+    def cancel_query(self, connection):
+        connection.cancel()
+
+    def describe_error(self, error):
+        return f"Error executing query: {error}"
+
+
+def table_name(index):
+    return f"{ENTITIES[index % len(ENTITIES)]}_{index:04d}"
+
+
+def seed_database(path, tables, rows=20000, rows_per_table=20, seed=0):
+    """Create a synthetic schema of tables tables plus an "orders" fact table of rows rows.
+
+    Every generated table has a primary key, a handful of typed columns and a foreign key
+    to an earlier table, so schema pruning has real neighbours to follow.
+    """
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    try:
+        with connection:
+            for index in range(tables):
+                name = table_name(index)
+                reference = f", parent_id INTEGER REFERENCES {table_name(rng.randrange(index))}(id)" if index else ""
+                connection.execute(f"""
+                    CREATE TABLE {name} (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        status TEXT,
+                        amount REAL,
+                        created_at TEXT{reference}
+                    )
+                """)
+                connection.executemany(
+                    f"INSERT INTO {name} (id, name, status, amount, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(row, f"{name} {row}", rng.choice(STATUSES), round(rng.uniform(1, 1000), 2),
+                      f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}") for row in range(rows_per_table)]
+                )
+
+            connection.execute("""
+                CREATE TABLE orders (
+                    id INTEGER PRIMARY KEY,
+                    customer_id INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    amount REAL,
+                    quantity INTEGER,
+                    note TEXT,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            connection.executemany(
+                "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(row, rng.randrange(1000), rng.choice(STATUSES), round(rng.uniform(1, 1000), 2),
+                  rng.randint(1, 20), None if row % 7 else "gift",
+                  f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}") for row in range(rows)]
+            )
+    finally:
+        connection.close()
@@ -0,0 +1,328 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from PySide6.QtCore import QAbstractListModel, QEvent, QModelIndex, QRect, QSize, Qt
+from PySide6.QtGui import QColor, QFont, QFontDatabase, QFontMetrics, QPainter, QPainterPath
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton
+
+
+class ChatEntry:
+    """One message in the chat history and the handle used to update it in place.
+
+    kind is "text" for a bubble, "typing" for the thinking indicator and "result" for
+    a query result shown by a live widget (or, once spilled, as a compact reference).
+    actions are (label, callback) pairs drawn as buttons under the bubble. details is
+    extra text (e.g. the timing breakdown) shown under the message once expanded.
+    """
+    def __init__(self, model, text, is_assistant=True, kind="text"):
+        self.model = model
+        self.text = text
+        self.is_assistant = is_assistant
+        self.kind = kind
+        self.timestamp = datetime.now().strftime("%I:%M %p")
+        self.note = None
+        self.actions = []
+        self.widget = None
+        self.spill_path = None
+        self.details = None
+        self.details_label = "Timings"
+        self.details_open = False
+        self.version = 0
+
+    def set_text(self, text):
+        self.text = text
+        self.changed()
+
+    def append_text(self, text):
+        self.text += text
+        self.changed()
+
+    def set_note(self, note):
+        self.note = note
+        self.changed()
+
+    def add_action(self, label, callback):
+        self.actions.append((label, callback))
+        self.changed()
+
+    def clear_actions(self):
+        self.actions = []
+        self.changed()
+
+    def set_details(self, details, label="Timings"):
+        """Attach collapsed details with a button that expands and collapses them."""
+        self.details = details
+        self.details_label = label
+        if not any(callback == self.toggle_details for _label, callback in self.actions):
+            self.actions.append((self.details_button(), self.toggle_details))
+        self.changed()
+
+    def details_button(self):
+        return f"{'▾' if self.details_open else '▸'} {self.details_label}"
+
+    def toggle_details(self):
+        self.details_open = not self.details_open
+        self.actions = [(self.details_button() if callback == self.toggle_details else label, callback)
+                        for label, callback in self.actions]
+        self.changed()
+
+    def footer(self):
+        return f"{self.note} · {self.timestamp}" if self.note else self.timestamp
+
+    def changed(self):
+        self.version += 1
+        self.model.entry_changed(self)
+
+    def remove(self):
+        self.model.remove_entry(self)
+
+
+class ChatHistoryModel(QAbstractListModel):
+    """The chat as a flat list of ChatEntry rows, capped at max_entries (oldest dropped first)."""
+    EntryRole = Qt.UserRole + 1
+
+    def __init__(self, max_entries=500, parent=None):
+        super().__init__(parent)
+        self.max_entries = max_entries
+        self.entries = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == self.EntryRole:
+            return entry
+        if role == Qt.DisplayRole:
+            return entry.text
+        return None
+
+    def add(self, text, is_assistant=True, kind="text", after=None):
+        """Append a new entry (or insert it right after another one) and return it."""
+        entry = ChatEntry(self, text, is_assistant=is_assistant, kind=kind)
+        row = self.entries.index(after) + 1 if after in self.entries else len(self.entries)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.insert(row, entry)
+        self.endInsertRows()
+        self.trim()
+        return entry
+
+    def index_of(self, entry):
+        if entry not in self.entries:
+            return QModelIndex()
+        return self.index(self.entries.index(entry))
+
+    def entry_changed(self, entry):
+        index = self.index_of(entry)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+    def remove_entry(self, entry):
+        if entry not in self.entries:
+            return
+        row = self.entries.index(entry)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.entries.pop(row)
+        self.endRemoveRows()
+        self.release(entry)
+
+    def trim(self):
+        excess = len(self.entries) - self.max_entries
+        if excess <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+        dropped, self.entries = self.entries[:excess], self.entries[excess:]
+        self.endRemoveRows()
+        for entry in dropped:
+            self.release(entry)
+
+    def release(self, entry):
+        # The view deletes index widgets of removed rows; stop their queries first
+        worker = getattr(entry.widget, "worker", None)
+        if worker is not None:
+            worker.close()
+        entry.widget = None
+        if entry.spill_path is not None:
+            discard_spill(entry.spill_path)
+            entry.spill_path = None
+
+    def clear(self):
+        self.beginResetModel()
+        dropped, self.entries = self.entries, []
+        self.endResetModel()
+        for entry in dropped:
+            self.release(entry)
+
+
+def spill_rows(columns, rows):
+    """Write a result to a temporary JSON-lines file and return its path.
+
+    Values that JSON cannot hold (dates, decimals, ...) are stored as text.
+    """
+    handle, path = tempfile.mkstemp(prefix="querymind_result_", suffix=".jsonl")
+    with os.fdopen(handle, "w", encoding="utf-8") as f:
+        f.write(json.dumps(list(columns)) + "\n")
+        for row in rows:
+            f.write(json.dumps(list(row), default=str) + "\n")
+    return path
+
+
+def load_spilled_rows(path):
+    """Return (columns, rows) written by spill_rows."""
+    with open(path, encoding="utf-8") as f:
+        columns = json.loads(f.readline())
+        return columns, [tuple(json.loads(line)) for line in f]
+
+
+def discard_spill(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ChatDelegate(QStyledItemDelegate):
+    """Paints chat entries as bubbles so only the visible ones cost anything.
+
+    Entries with a live widget (results) are sized after the widget and left to it.
+    """
+    MARGIN = 5
+    PADDING = 12
+    BUTTON_HEIGHT = 28
+    SPACING = 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._heights = {}  # (entry id, version, width) -> height
+
+    def entry_font(self, option, entry):
+        font = QFont(option.font)
+        if entry.kind == "typing":
+            font.setItalic(True)
+        return font
+
+    def footer_font(self, option):
+        font = QFont(option.font)
+        font.setPixelSize(10)
+        return font
+
+    def details_font(self, option):
+        font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        font.setPixelSize(11)
+        return font
+
+    def details_height(self, option, entry):
+        if not entry.details or not entry.details_open:
+            return 0
+        return QFontMetrics(self.details_font(option)).boundingRect(
+            QRect(0, 0, 100000, 100000), 0, entry.details
+        ).height() + self.SPACING
+
+    def text_rect(self, option, entry):
+        rect = option.rect.adjusted(self.MARGIN + self.PADDING, self.MARGIN + self.PADDING,
+                                    -(self.MARGIN + self.PADDING), 0)
+        height = QFontMetrics(self.entry_font(option, entry)).boundingRect(
+            QRect(0, 0, max(rect.width(), 1), 100000), Qt.TextWordWrap, entry.text
+        ).height()
+        rect.setHeight(height)
+        return rect
+
+    def button_rects(self, option, entry, top):
+        metrics = QFontMetrics(option.font)
+        rects = []
+        x = option.rect.left() + self.MARGIN
+        for label, _callback in entry.actions:
+            width = metrics.horizontalAdvance(label) + 24
+            rects.append(QRect(x, top, width, self.BUTTON_HEIGHT))
+            x += width + self.SPACING
+        return rects
+
+    def bubble_height(self, option, entry):
+        if entry.kind == "typing":
+            return self.text_rect(option, entry).height() + 2 * self.MARGIN
+        footer = QFontMetrics(self.footer_font(option)).height()
+        return (self.text_rect(option, entry).height() + self.details_height(option, entry) + footer
+                + 2 * self.PADDING + self.SPACING + 2 * self.MARGIN)
+
+    def sizeHint(self, option, index):
+        entry = index.data(ChatHistoryModel.EntryRole)
+        width = option.rect.width() or (option.widget.viewport().width() if option.widget else 400)
+        if entry.widget is not None:
+            return QSize(width, entry.widget.sizeHint().height())
+        key = (id(entry), entry.version, width)
+        height = self._heights.get(key)
+        if height is None:
+            option.rect = QRect(0, 0, width, 0)
+            height = self.bubble_height(option, entry)
+            if entry.actions:
+                height += self.BUTTON_HEIGHT + self.SPACING
+            if len(self._heights) > 2000:
+                self._heights.clear()
+            self._heights[key] = height
+        return QSize(width, height)
+
+    def paint(self, painter, option, index):
+        entry = index.data(ChatHistoryModel.EntryRole)
+        if entry.widget is not None:
+            return
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        text_rect = self.text_rect(option, entry)
+
+        if entry.kind == "typing":
+            text_rect.translate(-self.PADDING, -self.PADDING)
+            painter.setFont(self.entry_font(option, entry))
+            painter.setPen(QColor("#6b7280"))
+            painter.drawText(text_rect, Qt.TextWordWrap, entry.text)
+            painter.restore()
+            return
+
+        bubble_bottom = option.rect.top() + self.bubble_height(option, entry) - self.MARGIN
+        bubble = QRect(option.rect.left() + self.MARGIN, option.rect.top() + self.MARGIN,
+                       option.rect.width() - 2 * self.MARGIN, bubble_bottom - option.rect.top() - self.MARGIN)
+        path = QPainterPath()
+        path.addRoundedRect(bubble, 12, 12)
+        painter.fillPath(path, QColor("#f3f4f6" if entry.is_assistant else "#eff6ff"))
+
+        painter.setFont(self.entry_font(option, entry))
+        painter.setPen(QColor("#111827"))
+        painter.drawText(text_rect, Qt.TextWordWrap, entry.text)
+
+        details_height = self.details_height(option, entry)
+        if details_height:
+            details_rect = QRect(text_rect.left(), text_rect.bottom() + self.SPACING,
+                                 text_rect.width(), details_height - self.SPACING)
+            painter.setFont(self.details_font(option))
+            painter.setPen(QColor("#4b5563"))
+            painter.drawText(details_rect, 0, entry.details)
+
+        footer_rect = QRect(text_rect.left(), text_rect.bottom() + details_height + self.SPACING,
+                            text_rect.width(), QFontMetrics(self.footer_font(option)).height())
+        painter.setFont(self.footer_font(option))
+        painter.setPen(QColor("#9ca3af"))
+        painter.drawText(footer_rect, Qt.AlignRight, entry.footer())
+
+        painter.setFont(option.font)
+        for (label, _callback), rect in zip(entry.actions, self.button_rects(option, entry, bubble_bottom + self.SPACING)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = label
+            button.state = QStyle.State_Enabled
+            style = option.widget.style() if option.widget else QApplication.style()
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        entry = index.data(ChatHistoryModel.EntryRole)
+        if event.type() != QEvent.MouseButtonRelease or entry is None or not entry.actions:
+            return False
+        top = option.rect.top() + self.bubble_height(option, entry) - self.MARGIN + self.SPACING
+        for (_label, callback), rect in zip(entry.actions, self.button_rects(option, entry, top)):
+            if rect.contains(event.position().toPoint()):
+                callback()
+                return True
+        return False
@@ -0,0 +1,151 @@
+"""Headless QueryMind: answer questions in bulk or over a local HTTP API, without the GUI.
+
+    python cli.py batch questions.txt -o results.jsonl --concurrency 8
+    python cli.py serve --port 8765 --concurrency 8
+
+Both read the database, model and guard settings from the same settings.json as the app.
+A questions file holds one question per line, or one JSON object with a "question" per
+line if it ends in .jsonl. Results are written as JSON lines, in the order of the questions.
+"""
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+
+from historyStore import HistoryStore
+from queryCache import QueryCache
+from queryPipeline import QueryPipeline, manager_from_config
+from timingSpans import SpanLog
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    if path.endswith(".jsonl"):
+        return [json.loads(line)["question"] for line in lines if line]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def build_pipeline(config, model_name, concurrency):
+    db_manager = manager_from_config(config, min_pool_size=concurrency)
+    if not db_manager.connect():
+        raise SystemExit("Could not connect to the database, check the \"database\" section of the settings")
+
+    cache_config = config.get("query_cache", {})
+    query_cache = None
+    if cache_config.get("enabled", True):
+        query_cache = QueryCache(
+            "query_cache.sqlite",
+            max_entries=cache_config.get("max_entries", 500),
+            ttl_seconds=cache_config.get("ttl_hours", 168) * 3600,
+            fuzzy_threshold=cache_config.get("fuzzy_threshold")
+        )
+    history_store = HistoryStore("query_history.sqlite") if config.get("history", {}).get("enabled", True) else None
+    timing_config = config.get("timings", {})
+    span_log = None
+    if timing_config.get("log", True):
+        span_log = SpanLog(
+            "timings.jsonl",
+            max_bytes=timing_config.get("log_max_kb", 1024) * 1024,
+            backups=timing_config.get("log_backups", 3)
+        )
+    return QueryPipeline(
+        db_manager,
+        model_name or config["model"]["name"],
+        config=config,
+        query_cache=query_cache,
+        history_store=history_store,
+        span_log=span_log
+    )
+
+
+def close_pipeline(pipeline):
+    if pipeline.history_store is not None:
+        pipeline.history_store.close()
+    if pipeline.span_log is not None:
+        pipeline.span_log.close()
+    if pipeline.query_cache is not None:
+        pipeline.query_cache.close()
+    pipeline.db_manager.close()
+
+
+def run_batch(pipeline, args, stdout):
+    questions = load_questions(args.questions)
+    output = open(args.output, "w", encoding="utf-8") if args.output else stdout
+    started = time.perf_counter()
+    failed = 0
+    try:
+        results = pipeline.answer_many(
+            questions,
+            concurrency=args.concurrency,
+            execute=not args.no_execute,
+            max_rows=args.max_rows,
+            use_cache=not args.no_cache
+        )
+        for number, result in enumerate(results, 1):
+            failed += result["error"] is not None
+            output.write(json.dumps(result, default=str, ensure_ascii=False) + "\n")
+            output.flush()
+            if args.output:
+                status = "error" if result["error"] else f"{result['latency']:.2f} s"
+                print(f"[{number}/{len(questions)}] {status}  {result['question']}", file=sys.stderr)
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.perf_counter() - started
+    print(f"{len(questions)} questions in {elapsed:.1f} s ({failed} failed)", file=sys.stderr)
+    if pipeline.router is not None:
+        stats = pipeline.router.stats()
+        for model, model_stats in stats["models"].items():
+            print(f"  {model}: {model_stats['answers']} answers, median {model_stats['median_latency']:.2f} s", file=sys.stderr)
+        print(f"  {stats['escalated']} escalated to {pipeline.router.large_model}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def run_server(pipeline, args):
+    from apiServer import ApiServer
+
+    server = ApiServer(pipeline, host=args.host, port=args.port, concurrency=args.concurrency)
+    print(f"QueryMind API on {server.url} (model {pipeline.model_name}, {server.concurrency} at a time)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer questions with QueryMind without the GUI.")
+    parser.add_argument("--settings", default="settings.json", help="settings file of the app (default: settings.json)")
+    parser.add_argument("--model", help="Ollama model to use instead of the one in the settings")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions answered at once (default: 4)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="answer every question in a file")
+    batch.add_argument("questions", help="text file with one question per line, or .jsonl with a \"question\" field")
+    batch.add_argument("-o", "--output", help="JSON-lines file for the results (default: stdout)")
+    batch.add_argument("--max-rows", type=int, default=100, help="rows kept per result (default: 100)")
+    batch.add_argument("--no-execute", action="store_true", help="only generate the SQL")
+    batch.add_argument("--no-cache", action="store_true", help="always ask the model")
+
+    serve = commands.add_parser("serve", help="serve a local HTTP/JSON API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args(argv)
+    with open(args.settings, "r") as f:
+        config = json.load(f)
+
+    # The status lines printed along the way go to stderr, stdout is kept for the results
+    stdout = sys.stdout
+    with redirect_stdout(sys.stderr):
+        pipeline = build_pipeline(config, args.model, args.concurrency)
+        try:
+            return run_batch(pipeline, args, stdout) if args.command == "batch" else run_server(pipeline, args)
+        finally:
+            close_pipeline(pipeline)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
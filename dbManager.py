@@ -1,53 +1,319 @@
-from pymysql import connect as mysql_connect
-from psycopg2 import connect as pg_connect
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from queryPlan import summarize_mysql_plan, summarize_postgres_plan
+
+
+def returns_rows(query):
+    """True for statements PostgreSQL can run behind a named (server-side) cursor."""
+    query = re.sub(r"^(\s|--[^\n]*\n|/\*.*?\*/|\()+", "", query, flags=re.S)
+    return query[:6].lower().startswith(("select", "with", "values", "table"))
+
+
+class QueryStream:
+    """Result of DatabaseManager.stream_query, fetched in batches from a server-side cursor.
+
+    columns is set once the statement has run. rows_fetched counts the rows handed out so
+    far and total_rows is the size of the full result when known (None otherwise).
+    statement_timeout (seconds) and read_only guard the statement on the server side.
+    """
+    def __init__(self, manager, connection, query, params=None, batch_size=500, max_rows=None,
+                 count_total=False, owns_connection=False, statement_timeout=None, read_only=False):
+        self.manager = manager
+        self.connection = connection
+        self.query = query
+        self.params = params
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.count_total = count_total
+        self.owns_connection = owns_connection
+        self.statement_timeout = statement_timeout
+        self.read_only = read_only
+        self.columns = []
+        self.rows_fetched = 0
+        self.total_rows = None
+        self.exhausted = False
+        self.truncated = False
+        self._drained = False  # the cursor itself has been read to the end
+        self._buffer = []
+        self._cursor_name = None
+        self.cursor = self._execute()
+
+    def _apply_guards(self, connection=None):
+        timeout_ms = int((self.statement_timeout or 0) * 1000)
+        with (connection or self.connection).cursor() as cursor:
+            if self.manager.db_type == "postgresql":
+                # Both only last for the current transaction, which the pool rolls back on return
+                if self.read_only:
+                    cursor.execute("SET TRANSACTION READ ONLY")
+                cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+            else:
+                # Session variable, so it is set on every execution (0 disables it again)
+                try:
+                    cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (timeout_ms,))
+                except Exception:
+                    # MariaDB spells it differently and counts in seconds
+                    cursor.execute("SET SESSION max_statement_time = %s", (timeout_ms / 1000,))
+                if self.read_only:
+                    cursor.execute("START TRANSACTION READ ONLY")
+
+    def _execute(self):
+        self._apply_guards()
+        if self.manager.db_type == "postgresql" and returns_rows(self.query):
+            self._cursor_name = f"querymind_{uuid.uuid4().hex}"
+            cursor = self.connection.cursor(name=self._cursor_name)
+            cursor.itersize = self.batch_size
+            try:
+                cursor.execute(self.query, self.params)
+                # Named cursors only expose description after the first fetch
+                self._buffer = cursor.fetchmany(self.batch_size)
+            except Exception as e:
+                # e.g. data-modifying CTEs cannot be declared as cursors; fall back to a plain one
+                if getattr(e, "pgcode", None) not in ("0A000", "42P11"):
+                    raise
+                self.connection.rollback()
+                self._cursor_name = None
+                self._apply_guards()
+            else:
+                self.columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                return cursor
+
+        if self.manager.db_type == "mysql":
+            from pymysql.cursors import SSCursor
+            cursor = self.connection.cursor(SSCursor)
+        else:
+            cursor = self.connection.cursor()
+        cursor.execute(self.query, self.params)
+        if cursor.description:
+            self.columns = [desc[0] for desc in cursor.description]
+        else:
+            self.exhausted = self._drained = True
+            self.total_rows = 0
+        return cursor
+
+    def fetch(self):
+        """Return the next batch of rows, or an empty list once the stream is done."""
+        if self.exhausted:
+            return []
+
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+        else:
+            batch = self.cursor.fetchmany(self.batch_size)
+
+        if self.max_rows is not None and self.rows_fetched + len(batch) >= self.max_rows:
+            # Rows past the cap stay buffered: they tell whether the result is truncated
+            keep = self.max_rows - self.rows_fetched
+            drained = len(batch) < self.batch_size
+            batch, self._buffer = batch[:keep], batch[keep:]
+            self.rows_fetched += len(batch)
+            self._stop_at_cap(drained)
+            return batch
+
+        self.rows_fetched += len(batch)
+        if len(batch) < self.batch_size:
+            self.exhausted = self._drained = True
+            self.total_rows = self.rows_fetched
+        return batch
+
+    def _stop_at_cap(self, drained):
+        """Stop after the capped batch; drained when the cursor has no rows beyond _buffer."""
+        self.exhausted = True
+        if not self._buffer and not drained:
+            # Peek one row to tell "exactly max_rows" apart from "more rows exist"
+            row = self.cursor.fetchone()
+            if row is not None:
+                self._buffer = [row]
+            else:
+                drained = True
+        self.truncated = bool(self._buffer)
+        if drained:
+            self._drained = True
+            self.total_rows = self.rows_fetched + len(self._buffer)
+        elif self.count_total:
+            remaining = self._count_remaining()
+            if remaining is not None:
+                self.total_rows = self.rows_fetched + remaining
+
+    def _count_remaining(self):
+        """Rows left after rows_fetched (buffered ones included), or None when they cannot be counted."""
+        try:
+            if self._cursor_name:
+                # Counted server-side; the remaining rows are never sent to us
+                with self.connection.cursor() as cursor:
+                    cursor.execute(f'MOVE FORWARD ALL IN "{self._cursor_name}"')
+                    return cursor.rowcount + len(self._buffer)
+            if not self.read_only:
+                # Counting runs the statement again; only safe when it cannot write
+                return None
+            with self.manager.checkout() as counter:
+                self._apply_guards(counter)
+                with counter.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) FROM ({self.query.rstrip().rstrip(';')}) AS querymind_count", self.params)
+                    return cursor.fetchone()[0] - self.rows_fetched
+        except Exception as e:
+            print(f"Failed to count remaining rows: {e}")
+            return None
+
+    def __iter__(self):
+        while True:
+            batch = self.fetch()
+            if not batch:
+                return
+            yield batch
+
+    def close(self):
+        cursor, self.cursor = self.cursor, None
+        if cursor is not None:
+            try:
+                if self.manager.db_type == "mysql" and not self._drained:
+                    # SSCursor.close() would otherwise read every remaining row
+                    self.manager.cancel_query(self.connection)
+                cursor.close()
+            except Exception as e:
+                print(f"Failed to close cursor: {e}")
+        if self.owns_connection:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 
 class DatabaseManager:
-    def __init__(self, db_name, host, port, username, password, db_type="mysql"):
+    def __init__(self, db_name, host, port, username, password, db_type="mysql", schema_check_interval=30,
+                 pool_size=5, max_overflow=5, pool_recycle=1800, pool_timeout=30, idle_timeout=300):
         self.db_type = db_type.lower()
         self.db_name = db_name
         self.host = host
         self.port = port
         self.username = username
         self.password = password
-        self.connection = None
+        # Bounded pool of driver connections; every operation checks one out and returns it
+        self.engine = None
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.pool_timeout = pool_timeout
+        self.idle_timeout = idle_timeout
+        # Schema cache, rebuilt only when the fingerprint changes.
+        # The fingerprint itself is re-checked at most every schema_check_interval seconds.
+        # Locked so that concurrent callers (batch mode, the HTTP API) introspect only once.
+        self.schema_check_interval = schema_check_interval
+        self._schema_cache = None
+        self._schema_checked_at = 0.0
+        self._schema_lock = threading.RLock()
+
+    def create_engine(self):
+        # SQLAlchemy and the drivers are imported on first connect, not at startup
+        from sqlalchemy import create_engine, event, exc
+        from sqlalchemy.engine import URL
+
+        if self.db_type == "postgresql":
+            drivername = "postgresql+psycopg2"
+        elif self.db_type == "mysql":
+            drivername = "mysql+pymysql"
+        else:
+            raise ValueError("Unsupported database type")
+
+        engine = create_engine(
+            URL.create(
+                drivername,
+                username=self.username,
+                password=self.password,
+                host=self.host,
+                port=int(self.port),
+                database=self.db_name
+            ),
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_recycle=self.pool_recycle,
+            pool_timeout=self.pool_timeout,
+            pool_pre_ping=True
+        )
+
+        idle_timeout = self.idle_timeout
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            connection_record.info["checked_in_at"] = time.monotonic()
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            # Connections idle for too long are replaced instead of reused
+            checked_in_at = connection_record.info.get("checked_in_at")
+            if idle_timeout and checked_in_at and time.monotonic() - checked_in_at > idle_timeout:
+                raise exc.DisconnectionError("Connection idle for too long")
+
+        return engine
+
+    def open_connection(self):
+        """Check a connection out of the pool; close() on it returns it to the pool."""
+        if self.engine is None:
+            raise RuntimeError("Database not connected")
+        return self.engine.raw_connection()
+
+    @contextmanager
+    def checkout(self):
+        connection = self.open_connection()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def open_direct_connection(self):
+        """Open a driver connection outside the pool (used to cancel queries even when the pool is exhausted)."""
+        if self.db_type == "postgresql":
+            from psycopg2 import connect as pg_connect
+            return pg_connect(
+                dbname=self.db_name,
+                user=self.username,
+                password=self.password,
+                host=self.host,
+                port=self.port
+            )
+        elif self.db_type == "mysql":
+            from pymysql import connect as mysql_connect
+            return mysql_connect(
+                database=self.db_name,
+                user=self.username,
+                password=self.password,
+                host=self.host,
+                port=int(self.port)
+            )
+        else:
+            raise ValueError("Unsupported database type")
 
     def connect(self):
         try:
-            if self.db_type == "postgresql":
-                self.connection = pg_connect(
-                    dbname=self.db_name,
-                    user=self.username,
-                    password=self.password,
-                    host=self.host,
-                    port=self.port
-                )
-            elif self.db_type == "mysql":
-                self.connection = mysql_connect(
-                    database=self.db_name,
-                    user=self.username,
-                    password=self.password,
-                    host=self.host,
-                    port=int(self.port)
-                )
-            else:
-                raise ValueError("Unsupported database type")
+            if self.engine is None:
+                self.engine = self.create_engine()
+            # Check one connection out to verify the settings
+            with self.checkout():
+                pass
 
             print("✅ Database connection successful")
             return True
         except Exception as e:
             print(f"Database connection failed: {e}")
+            if self.engine is not None:
+                self.engine.dispose()
+                self.engine = None
             return False
 
     def close(self):
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        if self.engine is not None:
+            self.engine.dispose()
+            self.engine = None
+            self.invalidate_schema()
             print("🔒 Database connection closed")
 
     def extract_all_tables(self):
-        if not self.connection:
-            raise RuntimeError("Database not connected")
 
         query_pg = """
             SELECT table_name 
@@ -57,24 +323,23 @@ class DatabaseManager:
 
         query_mysql = "SHOW TABLES"
 
-        with self.connection.cursor() as cursor:
+        with self.checkout() as connection, connection.cursor() as cursor:
             cursor.execute(query_pg if self.db_type == "postgresql" else query_mysql)
             return [row[0] for row in cursor.fetchall()]
 
     def describe_table(self, table_name):
-        if not self.connection:
-            raise RuntimeError("Database not connected")
 
         if self.db_type == "postgresql":
             query = """
                 SELECT column_name, data_type
                 FROM information_schema.columns
-                WHERE table_name = %s
+                WHERE table_schema = 'public' AND table_name = %s
+                ORDER BY ordinal_position
             """
         else:
             query = f"DESCRIBE `{table_name}`"
 
-        with self.connection.cursor() as cursor:
+        with self.checkout() as connection, connection.cursor() as cursor:
             if self.db_type == "postgresql":
                 cursor.execute(query, (table_name,))
             else:
@@ -83,19 +348,189 @@ class DatabaseManager:
             return cursor.fetchall()
 
     def describe_all_tables(self):
-        schema = {}
-        tables = self.extract_all_tables()
+        return self.describe_schema()[0]
+
+    def introspection_queries(self):
+        """Return (columns_query, keys_query) for describe_schema.
+
+        columns_query yields (table, column, type, nullable, column comment, table comment)
+        and keys_query (table, column, "p" or "f", referenced table, referenced column).
+        """
+
+        if self.db_type == "postgresql":
+            columns_query = """
+                SELECT c.table_name, c.column_name, c.data_type, c.is_nullable,
+                       col_description(t.oid, c.ordinal_position::int),
+                       obj_description(t.oid, 'pg_class')
+                FROM information_schema.columns c
+                JOIN pg_namespace tn ON tn.nspname = c.table_schema
+                JOIN pg_class t ON t.relnamespace = tn.oid AND t.relname = c.table_name
+                WHERE c.table_schema = 'public'
+                ORDER BY c.table_name, c.ordinal_position
+            """
+            keys_query = """
+                SELECT cl.relname, a.attname, con.contype, fcl.relname, fa.attname
+                FROM pg_constraint con
+                JOIN pg_class cl ON cl.oid = con.conrelid
+                JOIN pg_namespace n ON n.oid = cl.relnamespace
+                JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum) ON TRUE
+                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                LEFT JOIN pg_class fcl ON fcl.oid = con.confrelid
+                LEFT JOIN pg_attribute fa ON fa.attrelid = con.confrelid AND fa.attnum = k.fattnum
+                WHERE n.nspname = 'public'
+                  AND con.contype IN ('p', 'f')
+            """
+        else:
+            columns_query = """
+                SELECT c.table_name, c.column_name, c.column_type, c.is_nullable,
+                       c.column_comment, t.table_comment
+                FROM information_schema.columns c
+                JOIN information_schema.tables t
+                  ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+                WHERE c.table_schema = DATABASE()
+                ORDER BY c.table_name, c.ordinal_position
+            """
+            keys_query = """
+                SELECT table_name, column_name,
+                       IF(constraint_name = 'PRIMARY', 'p', 'f'),
+                       referenced_table_name, referenced_column_name
+                FROM information_schema.key_column_usage
+                WHERE table_schema = DATABASE()
+                  AND (constraint_name = 'PRIMARY' OR referenced_table_name IS NOT NULL)
+            """
+        return columns_query, keys_query
+
+    def describe_schema(self):
+        """Introspect every table in two set-based queries instead of one query per table.
+
+        Returns (columns, foreign_keys, table_comments) where columns maps
+        table -> [(name, type, nullable, key, comment)] with key "PRI" for primary key columns,
+        foreign_keys maps table -> [(column, referenced_table, referenced_column)] and
+        table_comments maps table -> comment.
+        """
+        columns_query, keys_query = self.introspection_queries()
+        with self.checkout() as connection, connection.cursor() as cursor:
+            cursor.execute(columns_query)
+            column_rows = cursor.fetchall()
+            cursor.execute(keys_query)
+            key_rows = cursor.fetchall()
+
+        primary_keys = set()
+        foreign_keys = {}
+        for table, column, kind, ref_table, ref_column in key_rows:
+            if kind == "p":
+                primary_keys.add((table, column))
+            else:
+                foreign_keys.setdefault(table, []).append((column, ref_table, ref_column))
+
+        columns = {}
+        table_comments = {}
+        for table, column, data_type, nullable, comment, table_comment in column_rows:
+            key = "PRI" if (table, column) in primary_keys else ""
+            columns.setdefault(table, []).append((column, data_type, nullable, key, comment or ""))
+            if table_comment:
+                table_comments[table] = table_comment
+
+        return columns, foreign_keys, table_comments
+
+    def fingerprint_query(self):
+        """Return the single-row, single-column query behind schema_fingerprint."""
+
+        if self.db_type == "postgresql":
+            query = """
+                SELECT md5(
+                    COALESCE((
+                        SELECT string_agg(
+                            c.relname || '.' || a.attname || ':' || a.atttypid::text || ':' || a.attnotnull::text,
+                            ',' ORDER BY c.relname, a.attnum
+                        )
+                        FROM pg_attribute a
+                        JOIN pg_class c ON c.oid = a.attrelid
+                        JOIN pg_namespace n ON n.oid = c.relnamespace
+                        WHERE n.nspname = 'public'
+                          AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+                          AND a.attnum > 0
+                          AND NOT a.attisdropped
+                    ), '') || '|' ||
+                    COALESCE((
+                        SELECT string_agg(
+                            con.conrelid::text || ':' || con.contype || ':' || con.conkey::text || ':'
+                                || con.confrelid::text || ':' || COALESCE(con.confkey::text, ''),
+                            ',' ORDER BY con.conrelid, con.conname
+                        )
+                        FROM pg_constraint con
+                        JOIN pg_namespace n ON n.oid = con.connamespace
+                        WHERE n.nspname = 'public'
+                          AND con.contype IN ('p', 'f')
+                    ), '')
+                )
+            """
+        else:
+            # GROUP_CONCAT is truncated at group_concat_max_len, so sum per-column checksums instead
+            query = """
+                SELECT CONCAT(
+                    (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS('.',
+                        table_name, column_name, column_type, is_nullable))), 0))
+                     FROM information_schema.columns
+                     WHERE table_schema = DATABASE()),
+                    '|',
+                    (SELECT CONCAT(COUNT(*), ':', COALESCE(SUM(CRC32(CONCAT_WS('.',
+                        table_name, column_name, constraint_name,
+                        referenced_table_name, referenced_column_name))), 0))
+                     FROM information_schema.key_column_usage
+                     WHERE table_schema = DATABASE())
+                )
+            """
+        return query
 
-        for table in tables:
-            schema[table] = self.describe_table(table)
+    def schema_fingerprint(self):
+        """Cheap single-row hash of the column catalog, used to detect DDL changes."""
+        with self.checkout() as connection, connection.cursor() as cursor:
+            cursor.execute(self.fingerprint_query())
+            row = cursor.fetchone()
+            return str(row[0]) if row else ""
 
-        return schema
+    def get_schema(self, force_refresh=False):
+        """Return the cached schema, re-introspecting only when the fingerprint has changed.
+
+        The result is a dict with "tables", "columns", "foreign_keys" and "table_comments"
+        (see describe_schema) and "fingerprint".
+        """
+        with self._schema_lock:
+            cache = self._schema_cache
+            if cache is not None and not force_refresh:
+                if time.monotonic() - self._schema_checked_at < self.schema_check_interval:
+                    return cache
+                fingerprint = self.schema_fingerprint()
+                self._schema_checked_at = time.monotonic()
+                if fingerprint == cache["fingerprint"]:
+                    return cache
+            else:
+                fingerprint = self.schema_fingerprint()
+
+            columns, foreign_keys, table_comments = self.describe_schema()
+            tables = list(columns.keys())
+            self._schema_cache = {
+                "tables": tables,
+                "columns": columns,
+                "foreign_keys": foreign_keys,
+                "table_comments": table_comments,
+                "fingerprint": fingerprint
+            }
+            self._schema_checked_at = time.monotonic()
+            print(f"📚 Schema cache rebuilt ({len(tables)} tables)")
+            return self._schema_cache
+
+    def refresh_schema(self):
+        return self.get_schema(force_refresh=True)
+
+    def invalidate_schema(self):
+        self._schema_cache = None
+        self._schema_checked_at = 0.0
 
     def query_database(self, query, params=None):
-        if not self.connection:
-            raise RuntimeError("Database not connected")
         try:
-            with self.connection.cursor() as cursor:
+            with self.checkout() as connection, connection.cursor() as cursor:
                 cursor.execute(query, params)
                 results = cursor.fetchall()
                 # Store column info for later use
@@ -107,10 +542,89 @@ class DatabaseManager:
         except Exception as e:
             return f"Error executing query: {e}"
 
+    def stream_query(self, query, params=None, batch_size=500, max_rows=None, count_total=False, connection=None,
+                     statement_timeout=None, read_only=False):
+        """Run query and return a QueryStream that pulls rows in batches of batch_size.
+
+        At most max_rows rows are fetched. With count_total, the size of a truncated result
+        is counted as well. statement_timeout (seconds) makes the server abort the statement
+        and read_only runs it in a read-only transaction. Without a connection one is checked
+        out of the pool and returned when the stream is closed.
+        """
+        owns_connection = connection is None
+        if owns_connection:
+            connection = self.open_connection()
+        try:
+            return QueryStream(
+                self, connection, query, params,
+                batch_size=batch_size,
+                max_rows=max_rows,
+                count_total=count_total,
+                owns_connection=owns_connection,
+                statement_timeout=statement_timeout,
+                read_only=read_only
+            )
+        except Exception:
+            if owns_connection:
+                connection.close()
+            raise
+
+    def explain_query(self, query):
+        """Ask the planner for its estimates without running query; returns a plan summary."""
+        query = re.sub(r";\s*$", "", query.strip())
+        with self.checkout() as connection, connection.cursor() as cursor:
+            if self.db_type == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query}")
+                plan = cursor.fetchone()[0]
+                summary = summarize_postgres_plan(plan)
+                scanned = [table for table, _rows in summary["full_scans"]]
+                if scanned:
+                    # Size sequential scans by the table, not by the rows left after filtering
+                    cursor.execute("""
+                        SELECT c.relname, c.reltuples::bigint
+                        FROM pg_class c
+                        JOIN pg_namespace n ON n.oid = c.relnamespace
+                        WHERE n.nspname = 'public' AND c.relname = ANY(%s)
+                    """, (scanned,))
+                    summary = summarize_postgres_plan(plan, table_rows=dict(cursor.fetchall()))
+                return summary
+            cursor.execute(f"EXPLAIN FORMAT=JSON {query}")
+            return summarize_mysql_plan(cursor.fetchone()[0])
+
+    def describe_error(self, error):
+        """Turn guard violations into a message for the chat; other errors are passed through."""
+        if self.db_type == "postgresql":
+            code = getattr(error, "pgcode", None)
+            timed_out = code == "57014"
+            read_only = code == "25006"
+        else:
+            code = error.args[0] if getattr(error, "args", None) else None
+            timed_out = code in (3024, 1969)
+            read_only = code == 1792
+        if timed_out:
+            return "Query stopped: it exceeded the statement timeout. Narrow it down or raise query_guards.statement_timeout."
+        if read_only:
+            return "Query blocked: read-only mode does not allow changing data (query_guards.read_only)."
+        return f"Error executing query: {error}"
+
+    def cancel_query(self, connection):
+        """Cancel the statement running on connection from another thread, server-side."""
+        if self.db_type == "postgresql":
+            # Sends a protocol-level cancel request, like pg_cancel_backend() on its backend pid
+            connection.cancel()
+        else:
+            killer = self.open_direct_connection()
+            try:
+                with killer.cursor() as cursor:
+                    cursor.execute("KILL QUERY %s", (connection.thread_id(),))
+            finally:
+                killer.close()
+
     def get_last_columns(self):
         return getattr(self, '_last_columns', [])
 
     def test_connection(self):
+        was_connected = self.engine is not None
         try:
             if not self.connect():
                 return False, "Failed to connect to database"
@@ -121,7 +635,7 @@ class DatabaseManager:
             else:  # MySQL
                 test_query = "SELECT 1"
             
-            with self.connection.cursor() as cursor:
+            with self.checkout() as connection, connection.cursor() as cursor:
                 cursor.execute(test_query)
                 result = cursor.fetchone()
                 if result and result[0] == 1:
@@ -132,9 +646,11 @@ class DatabaseManager:
         except Exception as e:
             return False, f"Connection test failed: {str(e)}"
         finally:
-            self.close()
+            if not was_connected:
+                self.close()
             
     def get_database_info(self):
+        was_connected = self.engine is not None
         if not self.connect():
             return "Not connected to any database"
             
@@ -153,7 +669,7 @@ class DatabaseManager:
             else:  # MySQL
                 version_query = "SELECT VERSION()"
             
-            with self.connection.cursor() as cursor:
+            with self.checkout() as connection, connection.cursor() as cursor:
                 cursor.execute(version_query)
                 info["version"] = cursor.fetchone()[0]
                 
@@ -211,4 +727,5 @@ class DatabaseManager:
         except Exception as e:
             return f"Error getting database info: {str(e)}"
         finally:
-            self.close()
\ No newline at end of file
+            if not was_connected:
+                self.close()
\ No newline at end of file
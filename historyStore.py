@@ -0,0 +1,140 @@
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+HISTORY_FIELDS = ("question", "sql", "model", "latency", "row_count", "error")
+
+
+class HistoryStore:
+    """Local, searchable record of every question and the SQL generated for it.
+
+    record() and update() only queue the change; a background thread writes queued
+    changes in one transaction every flush_interval seconds (or once batch_size are
+    waiting), so the GUI thread never waits on the disk. search() reads through its
+    own connection and uses the FTS5 index over question and SQL.
+    """
+    def __init__(self, path, flush_interval=0.5, batch_size=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = queue.Queue()
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                created_at REAL NOT NULL,
+                question TEXT,
+                sql TEXT,
+                model TEXT,
+                latency REAL,
+                row_count INTEGER,
+                error TEXT
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+                question, sql, content='history', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+                INSERT INTO history_fts(rowid, question, sql) VALUES (new.id, new.question, new.sql);
+            END;
+            CREATE TRIGGER IF NOT EXISTS history_au AFTER UPDATE OF question, sql ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, question, sql) VALUES ('delete', old.id, old.question, old.sql);
+                INSERT INTO history_fts(rowid, question, sql) VALUES (new.id, new.question, new.sql);
+            END;
+            CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+                INSERT INTO history_fts(history_fts, rowid, question, sql) VALUES ('delete', old.id, old.question, old.sql);
+            END;
+        """)
+        self.connection.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, **fields):
+        """Queue a new history entry and return its key for later update() calls."""
+        key = uuid.uuid4().hex
+        self._pending.put(("insert", key, time.time(), fields))
+        return key
+
+    def update(self, key, **fields):
+        self._pending.put(("update", key, None, fields))
+
+    def _write_loop(self):
+        writer = sqlite3.connect(self.path)
+        running = True
+        while running:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self._pending.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            flushed = [operation[1] for operation in batch if operation[0] == "flush"]
+            try:
+                with writer:
+                    for operation in batch:
+                        if operation[0] != "flush":
+                            self._apply(writer, *operation)
+            except sqlite3.Error as e:
+                print(f"Failed to write query history: {e}")
+            for event in flushed:
+                event.set()
+        writer.close()
+
+    def _apply(self, writer, operation, key, created_at, fields):
+        fields = {name: value for name, value in fields.items() if name in HISTORY_FIELDS}
+        if operation == "insert":
+            names = ["key", "created_at"] + list(fields)
+            writer.execute(
+                f"INSERT INTO history ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                [key, created_at] + list(fields.values())
+            )
+        elif fields:
+            writer.execute(
+                f"UPDATE history SET {', '.join(f'{name} = ?' for name in fields)} WHERE key = ?",
+                list(fields.values()) + [key]
+            )
+
+    def search(self, text, limit=50):
+        """Return matching entries as dicts, best match first; recent entries when text is empty."""
+        terms = re.findall(r"\w+", text or "")
+        columns = "h.key, h.created_at, h.question, h.sql, h.model, h.latency, h.row_count, h.error"
+        if terms:
+            # Every term must match, each as a prefix so results show up while typing
+            match = " ".join(f'"{term}"*' for term in terms)
+            rows = self.connection.execute(
+                f"""
+                SELECT {columns} FROM history_fts
+                JOIN history h ON h.id = history_fts.rowid
+                WHERE history_fts MATCH ?
+                ORDER BY bm25(history_fts), h.created_at DESC
+                LIMIT ?
+                """,
+                (match, limit)
+            ).fetchall()
+        else:
+            rows = self.connection.execute(
+                f"SELECT {columns} FROM history h ORDER BY h.created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        names = ("key", "created_at") + HISTORY_FIELDS
+        return [dict(zip(names, row)) for row in rows]
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far is written."""
+        done = threading.Event()
+        self._pending.put(("flush", done, None, None))
+        done.wait(timeout)
+
+    def close(self):
+        self._pending.put(None)
+        self._writer.join()
+        self.connection.close()
@@ -0,0 +1,101 @@
+import re
+import statistics
+import threading
+from collections import deque
+
+from schemaIndex import tokenize
+
+# Kinds of SQL a question implies, each adding one point to its complexity
+COMPLEXITY_PATTERNS = {
+    "join": r"\b(each|per|for every|along with|with their|together with|across|and their)\b",
+    "aggregation": r"\b(average|avg|sum|total|count|how many|number of|maximum|minimum|max|min|most|least|top \d+|rank\w*|median|percent\w*|ratio|share)\b",
+    "comparison": r"\b(compare\w*|versus|vs|than|difference|growth|trend|change|over time|month over month|year over year)\b",
+    "exclusion": r"\b(without|never|not|except|excluding|neither|nor)\b",
+    "nesting": r"\b(who also|that also|which also|that have|who have|which have|at least|at most|more than|less than)\b",
+}
+
+
+def complexity(question, tables, all_tables):
+    """Cheap complexity estimate of question: (score, reasons).
+
+    One point per kind of SQL the wording implies (joins, aggregation, comparisons,
+    exclusions, nested conditions), one per entity beyond the second that the question
+    names from tables (the ones picked for its prompt; "orders" and "order_items" are one
+    entity, "order"), and one for a schema of more than 100 tables.
+    """
+    text = question.lower()
+    reasons = [kind for kind, pattern in COMPLEXITY_PATTERNS.items() if re.search(pattern, text)]
+    score = len(reasons)
+
+    table_terms = {term for table in tables for term in tokenize(table) if not term.isdigit()}
+    entities = set(tokenize(question)) & table_terms
+    if len(entities) > 2:
+        score += len(entities) - 2
+        reasons.append(f"{len(entities)} tables")
+    if len(all_tables) > 100:
+        score += 1
+        reasons.append("large schema")
+    return score, reasons
+
+
+class ModelRouter:
+    """Sends each question to the small model unless it looks complex; escalates to the large one.
+
+    route() decides from the complexity score, escalation happens when the small model's
+    SQL fails validation (see OllamaAgent and QueryPipeline). record() keeps the latency of
+    the last answers per model, stats() summarises them. Safe to share between threads.
+    """
+    def __init__(self, small_model, large_model, threshold=3, history=200):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.threshold = threshold
+        self._latencies = {}  # model -> generation seconds of its recent answers
+        self._counts = {"small": 0, "large": 0, "escalated": 0}
+        self._history = history
+        self._lock = threading.Lock()
+
+    @property
+    def cache_key(self):
+        # Cached SQL belongs to the pair of models, whichever of them answered
+        return f"{self.small_model}|{self.large_model}"
+
+    def route(self, question, tables, all_tables):
+        """Return the routing decision for question: a dict with model, score and reasons."""
+        score, reasons = complexity(question, tables, all_tables)
+        model = self.large_model if score >= self.threshold else self.small_model
+        return {
+            "model": model,
+            "score": score,
+            "reasons": reasons,
+            "escalate_to": self.large_model if model != self.large_model else None
+        }
+
+    def record(self, model, seconds, escalated=False):
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self._history)).append(seconds)
+            self._counts["large" if model == self.large_model else "small"] += 1
+            if escalated:
+                self._counts["escalated"] += 1
+
+    def stats(self):
+        """Answers and median latency per model, plus how many answers were escalated."""
+        with self._lock:
+            return {
+                "models": {
+                    model: {"answers": len(values), "median_latency": statistics.median(values)}
+                    for model, values in self._latencies.items() if values
+                },
+                **self._counts
+            }
+
+
+def router_from_config(config, default_model):
+    """A ModelRouter for the "routing" section of settings.json, or None when routing is off."""
+    routing = config.get("routing", {})
+    if not routing.get("enabled") or not routing.get("large_model"):
+        return None
+    return ModelRouter(
+        routing.get("small_model") or default_model,
+        routing["large_model"],
+        threshold=routing.get("complexity_threshold", 3)
+    )
@@ -0,0 +1,59 @@
+import json
+import os
+import urllib.request
+
+DEFAULT_PORT = 11434
+
+
+def chat(**kwargs):
+    """ollama.chat, imported on first use: the client (with httpx) takes about half a second to import."""
+    from ollama import chat as ollama_chat
+    return ollama_chat(**kwargs)
+
+
+def ollama_url():
+    """Base URL of the local Ollama server, from OLLAMA_HOST like the ollama client."""
+    host = os.environ.get("OLLAMA_HOST", "").strip() or "127.0.0.1"
+    scheme, _, host = host.rpartition("://")
+    host = host.rstrip("/")
+    if not host.rsplit("]", 1)[-1].count(":"):
+        host = f"{host}:{DEFAULT_PORT}"
+    if host.startswith("0.0.0.0:"):
+        host = "127.0.0.1" + host[len("0.0.0.0"):]
+    return f"{scheme or 'http'}://{host}"
+
+
+def list_models(timeout=5):
+    """Names of the locally pulled models, from Ollama's /api/tags endpoint."""
+    with urllib.request.urlopen(f"{ollama_url()}/api/tags", timeout=timeout) as response:
+        payload = json.load(response)
+    return sorted(model["name"] for model in payload.get("models", []))
+
+
+def post(path, payload, timeout):
+    request = urllib.request.Request(
+        f"{ollama_url()}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def load_model(model, keep_alive="30m", timeout=600):
+    """Load model into memory and keep it there for keep_alive after its last use.
+
+    An empty generate request: Ollama loads the model and returns without generating.
+    """
+    return post("/api/generate", {"model": model, "keep_alive": keep_alive}, timeout)
+
+
+def unload_model(model, timeout=30):
+    return post("/api/generate", {"model": model, "keep_alive": 0}, timeout)
+
+
+def running_models(timeout=5):
+    """Names of the models Ollama currently holds in memory (/api/ps)."""
+    with urllib.request.urlopen(f"{ollama_url()}/api/ps", timeout=timeout) as response:
+        payload = json.load(response)
+    return [model["name"] for model in payload.get("models", [])]
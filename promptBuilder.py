@@ -0,0 +1,129 @@
+import re
+
+from schemaIndex import estimate_tokens
+
+# Kept byte-identical across questions for the same model and schema, so Ollama can
+# reuse the KV cache for this prefix and only evaluate the new user turn.
+SYSTEM_PROMPT = """
+You are a SQL expert. Given the following database tables:
+{tables}.
+{schema}
+Instructions:
+1. Convert the user's natural language question into a valid SQL query.
+2. Only use tables and columns that exist in the schema.
+3. Return ONLY the SQL code in a single line.
+4. If the query is ambiguous, make reasonable assumptions and note them in comments.
+5. If the query cannot be answered with the given schema, explain why.
+
+Example:
+User: Show me all users who signed up last month
+Response: SELECT * FROM users WHERE signup_date >= DATE_TRUNC('month', CURRENT_DATE - INTERVAL '1 month') AND signup_date < DATE_TRUNC('month', CURRENT_DATE);
+"""
+
+# Follow-up turn when the generated SQL fails local validation. Appended to the original
+# conversation, so the cached prompt prefix is reused for the retry.
+REPAIR_PROMPT = """The SQL you returned is not valid for this database:
+{problems}
+Fix it using only the tables and columns in the schema. Return ONLY the corrected SQL in a single line.
+"""
+
+# Above this many tokens the system prompt gives the number of tables instead of their names;
+# the pruned schema that travels with each question names the relevant ones
+TABLE_LIST_TOKENS = 500
+
+STATS_FIELDS = (
+    "total_duration", "load_duration",
+    "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration"
+)
+
+SQL_KEYWORDS = (
+    "select", "insert", "update", "delete",
+    "create", "drop", "alter", "truncate",
+    "with", "show", "describe", "explain"
+)
+
+
+class PromptBuilder:
+    """Builds the chat messages for a question, reusing the system prompt per model and schema."""
+    def __init__(self):
+        self._system_prompts = {}  # (model, schema fingerprint, full schema) -> system prompt
+
+    def build_messages(self, request):
+        """Split the prompt into a stable system prefix and a per-question user turn.
+
+        When the whole schema was selected it lives in the system prompt; otherwise the
+        prefix only lists the tables and the relevant columns travel with the question.
+        """
+        full_schema = len(request["db_tables"]) >= len(request["all_tables"])
+        key = (request["model_name"], request["schema_fingerprint"], full_schema)
+        system_prompt = self._system_prompts.get(key)
+        if system_prompt is None or request["schema_fingerprint"] is None:
+            system_prompt = SYSTEM_PROMPT.format(
+                tables=table_list(request["all_tables"]),
+                schema=f"\nDatabase Schema:\n{request['db_schema']}\n" if full_schema else ""
+            )
+            self._system_prompts[key] = system_prompt
+
+        if full_schema:
+            user_prompt = request["query"]
+        else:
+            user_prompt = f"Relevant schema:\n{request['db_schema']}\n\nQuestion: {request['query']}"
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def repair_messages(self, messages, answer, problems):
+        """The conversation so far plus the rejected answer and what is wrong with it."""
+        return messages + [
+            {"role": "assistant", "content": answer},
+            {"role": "user", "content": REPAIR_PROMPT.format(problems="\n".join(f"- {problem}" for problem in problems))}
+        ]
+
+
+def table_list(tables):
+    names = ", ".join(sorted(tables))
+    if estimate_tokens(names) <= TABLE_LIST_TOKENS:
+        return names
+    return f"{len(tables)} tables, the ones relevant to each question are given with it"
+
+
+def response_stats(response):
+    """Ollama's timing counters from a (final) response chunk."""
+    return {field: response.get(field) for field in STATS_FIELDS if response.get(field) is not None}
+
+
+def trace_stats(trace, stats, end):
+    """Add Ollama's own durations to trace, laid out back to back (load, prompt eval, generation) up to end."""
+    spans = (("ollama.load", "load_duration", None),
+             ("ollama.prompt_eval", "prompt_eval_duration", "prompt_eval_count"),
+             ("ollama.eval", "eval_duration", "eval_count"))
+    start = end - sum(stats.get(duration, 0) for _name, duration, _count in spans) / 1e9
+    for name, duration, count in spans:
+        if stats.get(duration) is None:
+            continue
+        seconds = stats[duration] / 1e9
+        attributes = {"tokens": stats[count]} if count and stats.get(count) is not None else {}
+        trace.add(name, seconds, start=start, source="ollama", **attributes)
+        start += seconds
+
+
+def extract_message_content(response):
+    if hasattr(response, "message"):
+        return response.message.content
+    if isinstance(response, dict):
+        return response.get("message", {}).get("content")
+    return None
+
+
+def extract_sql(text):
+    """Strip the Markdown code fences models like to wrap SQL in."""
+    return re.sub(r"```sql|```", "", text or "").strip()
+
+
+def is_sql_query(query):
+    if not query:
+        return False
+    return query.strip().lower().startswith(SQL_KEYWORDS)
@@ -0,0 +1,110 @@
+import difflib
+import re
+import sqlite3
+import threading
+import time
+
+
+def normalize_question(question):
+    """Lowercase and strip punctuation/extra whitespace so trivial rewordings share a key."""
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+class QueryCache:
+    """Persistent map from (normalized question, model, schema fingerprint) to accepted SQL.
+
+    Entries expire after ttl_seconds and the least recently used ones are evicted beyond
+    max_entries. With a fuzzy_threshold (0-1), near-duplicate questions for the same model
+    and schema are matched as well. One cache can be shared by several threads.
+    """
+    def __init__(self, path, max_entries=500, ttl_seconds=7 * 24 * 3600, fuzzy_threshold=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS query_cache (
+                question TEXT NOT NULL,
+                model TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (question, model, fingerprint)
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, question, model, fingerprint):
+        """Return (sql, cached_question) for a hit, or None."""
+        with self._lock:
+            now = time.time()
+            if self.ttl_seconds:
+                self.connection.execute("DELETE FROM query_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+            key = normalize_question(question)
+            row = self.connection.execute(
+                "SELECT question, sql FROM query_cache WHERE question = ? AND model = ? AND fingerprint = ?",
+                (key, model, fingerprint)
+            ).fetchone()
+
+            if row is None and self.fuzzy_threshold:
+                best_ratio = self.fuzzy_threshold
+                for candidate, sql in self.connection.execute(
+                    "SELECT question, sql FROM query_cache WHERE model = ? AND fingerprint = ?",
+                    (model, fingerprint)
+                ):
+                    ratio = difflib.SequenceMatcher(None, key, candidate).ratio()
+                    if ratio >= best_ratio:
+                        best_ratio = ratio
+                        row = (candidate, sql)
+
+            if row is None:
+                self.connection.commit()
+                return None
+
+            self.connection.execute(
+                "UPDATE query_cache SET last_used = ?, hits = hits + 1 WHERE question = ? AND model = ? AND fingerprint = ?",
+                (now, row[0], model, fingerprint)
+            )
+            self.connection.commit()
+            return row[1], row[0]
+
+    def put(self, question, model, fingerprint, sql):
+        with self._lock:
+            now = time.time()
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO query_cache (question, model, fingerprint, sql, created_at, last_used, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+                """,
+                (normalize_question(question), model, fingerprint, sql, now, now)
+            )
+            # Least recently used entries go first
+            self.connection.execute(
+                """
+                DELETE FROM query_cache WHERE rowid IN (
+                    SELECT rowid FROM query_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self.connection.commit()
+
+    def invalidate(self, question, model, fingerprint):
+        with self._lock:
+            self.connection.execute(
+                "DELETE FROM query_cache WHERE question = ? AND model = ? AND fingerprint = ?",
+                (normalize_question(question), model, fingerprint)
+            )
+            self.connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM query_cache")
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
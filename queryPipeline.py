@@ -0,0 +1,226 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dbManager import DatabaseManager
+from modelRouter import router_from_config
+from ollamaClient import chat
+from promptBuilder import (PromptBuilder, extract_message_content, extract_sql, is_sql_query,
+                           response_stats, trace_stats)
+from schemaIndex import SchemaContext
+from sqlValidation import SqlValidator
+from timingSpans import Trace
+
+
+def manager_from_config(config, min_pool_size=0):
+    """Build a DatabaseManager from the "database" and "pool" sections of settings.json.
+
+    The pool gets at least min_pool_size connections, so that many questions can run at once.
+    """
+    database = config["database"]
+    pool_config = config.get("pool", {})
+    return DatabaseManager(
+        db_type=database["type"],
+        db_name=database["name"],
+        host=database["host"],
+        port=database["port"],
+        username=database["username"],
+        password=database["password"],
+        pool_size=max(pool_config.get("size", 5), min_pool_size),
+        max_overflow=pool_config.get("max_overflow", 5),
+        pool_recycle=pool_config.get("recycle", 1800),
+        pool_timeout=pool_config.get("timeout", 30),
+        idle_timeout=pool_config.get("idle_timeout", 300)
+    )
+
+
+class QueryPipeline:
+    """The question -> SQL -> rows pipeline without any Qt, for batch runs and the HTTP API.
+
+    Uses the same pieces as the chat: the schema cache of DatabaseManager, schema pruning,
+    the agent's prompt layout (so Ollama's prompt cache stays warm across questions),
+    the query cache, the query guards and the history store. One pipeline is meant to be
+    shared by many threads; concurrency is bounded by the caller (see answer_many).
+
+    With routing enabled in the settings, each question goes to the model its
+    complexity calls for and escalates to the large model when the SQL fails validation.
+    """
+    def __init__(self, db_manager, model_name, config=None, query_cache=None, history_store=None, span_log=None):
+        self.db_manager = db_manager
+        self.model_name = model_name
+        self.config = config or {}
+        self.query_cache = query_cache
+        self.history_store = history_store
+        self.span_log = span_log
+        self.prompts = PromptBuilder()
+        self.schema_context = SchemaContext()
+        self.validator = SqlValidator(db_manager.db_type) if self.config.get("validation", {}).get("enabled", True) else None
+        self.router = router_from_config(self.config, model_name)
+
+    @property
+    def cache_model(self):
+        """Model name the query cache files answers under."""
+        return self.router.cache_key if self.router is not None else self.model_name
+
+    def generate_sql(self, question, use_cache=True, trace=None):
+        """Return (sql, message): the generated SQL, or None and the model's reply when it is not SQL.
+
+        SQL that fails validation against the schema is sent back to the model with the problems
+        (up to validation.max_repairs times). Problems left after that are in trace.attributes["invalid"].
+        The model that answered is in trace.attributes["model"].
+        """
+        trace = trace or Trace("question", model=self.model_name)
+        with trace.span("schema"):
+            schema = self.db_manager.get_schema()
+
+        if use_cache and self.query_cache is not None:
+            with trace.span("cache") as attributes:
+                cached = self.query_cache.get(question, self.cache_model, schema["fingerprint"])
+                attributes["hit"] = cached is not None
+            if cached is not None:
+                trace.attributes["cached"] = True
+                return cached[0], None
+
+        context_config = self.config.get("schema_context", {})
+        with trace.span("schema_context") as attributes:
+            schema_str, tables = self.schema_context.build(
+                schema, question,
+                top_k=context_config.get("top_k", 8),
+                token_budget=context_config.get("token_budget", 3000)
+            )
+            attributes["tables"] = len(tables)
+
+        model, escalate_to = self.model_name, None
+        if self.router is not None:
+            decision = self.router.route(question, tables, schema["tables"])
+            model, escalate_to = decision["model"], decision["escalate_to"]
+            trace.attributes["route"] = ", ".join(decision["reasons"]) or "simple"
+            trace.attributes["complexity"] = decision["score"]
+        trace.attributes["model"] = model
+
+        with trace.span("prompt"):
+            messages = self.prompts.build_messages({
+                "query": question,
+                "model_name": model,
+                "db_schema": schema_str,
+                "db_tables": tables,
+                "all_tables": schema["tables"],
+                "schema_fingerprint": schema["fingerprint"]
+            })
+
+        answer = self.complete(messages, trace, model)
+        content = extract_sql(answer)
+        if not is_sql_query(content):
+            return None, content
+
+        max_repairs = self.config.get("validation", {}).get("max_repairs", 2)
+        repairs = 0
+        while self.validator is not None:
+            with trace.span("sql.validate") as attributes:
+                problems = self.validator.validate(content, schema)
+                attributes["problems"] = len(problems)
+            if not problems:
+                break
+            if escalate_to is not None:
+                # The small model got it wrong: hand its attempt and the problems to the large one
+                model, escalate_to = escalate_to, None
+                trace.attributes["model"] = model
+                trace.attributes["escalated"] = True
+            elif repairs >= max_repairs:
+                trace.attributes["invalid"] = problems
+                break
+            else:
+                repairs += 1
+            messages = self.prompts.repair_messages(messages, answer, problems)
+            answer = self.complete(messages, trace, model)
+            content = extract_sql(answer)
+            if not is_sql_query(content):
+                return None, content
+        trace.attributes["repairs"] = repairs
+
+        if self.query_cache is not None and "invalid" not in trace.attributes:
+            self.query_cache.put(question, self.cache_model, schema["fingerprint"], content)
+        return content, None
+
+    def complete(self, messages, trace, model=None):
+        with trace.span("llm.generate") as attributes:
+            attributes["model"] = model or self.model_name
+            response = chat(
+                model=model or self.model_name,
+                messages=messages,
+                keep_alive=self.config.get("agent", {}).get("keep_alive", "30m")
+            )
+        trace_stats(trace, response_stats(response), time.perf_counter())
+        return extract_message_content(response)
+
+    def run_sql(self, sql, max_rows=100, trace=None):
+        """Run sql under the configured query guards; returns columns, up to max_rows rows and counts."""
+        trace = trace or Trace("query", sql=sql)
+        guard_config = self.config.get("query_guards", {})
+        with trace.span("db.execute") as attributes:
+            with self.db_manager.stream_query(
+                sql,
+                batch_size=self.config.get("results", {}).get("batch_size", 500),
+                max_rows=max_rows,
+                statement_timeout=guard_config.get("statement_timeout", 30),
+                read_only=guard_config.get("read_only", True)
+            ) as stream:
+                rows = [row for batch in stream for row in batch]
+                attributes["rows"] = len(rows)
+                return {
+                    "columns": stream.columns,
+                    "rows": [list(row) for row in rows],
+                    "row_count": len(rows),
+                    "truncated": stream.truncated
+                }
+
+    def answer(self, question, execute=True, max_rows=100, use_cache=True):
+        """Answer one question end to end; never raises, failures are reported under "error"."""
+        trace = Trace("question", model=self.model_name, source="pipeline")
+        result = {"question": question, "sql": None, "cached": False, "error": None}
+        try:
+            sql, message = self.generate_sql(question, use_cache=use_cache, trace=trace)
+            result["sql"] = sql
+            result["cached"] = bool(trace.attributes.get("cached"))
+            result["repairs"] = trace.attributes.get("repairs", 0)
+            result["validation"] = trace.attributes.get("invalid", [])
+            result["model"] = trace.attributes.get("model")
+            if self.router is not None:
+                result["route"] = {
+                    "reason": trace.attributes.get("route"),
+                    "complexity": trace.attributes.get("complexity"),
+                    "escalated": bool(trace.attributes.get("escalated"))
+                }
+            if sql is None:
+                result["error"] = "Not a database question"
+                result["message"] = message
+            elif execute:
+                result.update(self.run_sql(sql, max_rows=max_rows, trace=trace))
+        except Exception as e:
+            result["error"] = self.db_manager.describe_error(e) if result["sql"] else f"Error generating SQL: {e}"
+        trace.finish(error=result["error"])
+
+        result["latency"] = round(trace.duration, 4)
+        # Milliseconds per stage; repeated spans (e.g. a repaired answer's second llm.generate) are added up
+        timings = {}
+        for span in trace.spans:
+            timings[span["name"]] = timings.get(span["name"], 0) + span["duration"] * 1000
+        result["timings"] = {name: round(ms, 2) for name, ms in timings.items()}
+        if self.router is not None and result["sql"] and not result["cached"]:
+            self.router.record(result["model"], trace.total("llm.generate"), escalated=result["route"]["escalated"])
+        if self.span_log is not None:
+            self.span_log.write(trace)
+        if self.history_store is not None:
+            self.history_store.record(
+                question=question,
+                sql=result["sql"],
+                model=result.get("model") or self.model_name,
+                latency=trace.duration,
+                row_count=result.get("row_count"),
+                error=result["error"]
+            )
+        return result
+
+    def answer_many(self, questions, concurrency=4, **options):
+        """Answer questions on up to concurrency threads; yields results in input order."""
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="querymind") as executor:
+            yield from executor.map(lambda question: self.answer(question, **options), questions)
@@ -0,0 +1,74 @@
+import json
+
+
+def summarize_postgres_plan(plan, table_rows=None):
+    """Reduce EXPLAIN (FORMAT JSON) output to estimated cost, result rows and sequential scans.
+
+    table_rows maps table names to their size (pg_class.reltuples); without it a
+    sequential scan is sized by the rows the planner expects it to return.
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    full_scans = []
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+            table = node["Relation Name"]
+            rows = (table_rows or {}).get(table)
+            if rows is None or rows < 0:  # -1 until the table has been analyzed
+                rows = node.get("Plan Rows", 0)
+            full_scans.append((table, int(rows)))
+        nodes.extend(node.get("Plans", []))
+    return {
+        "total_cost": root.get("Total Cost"),
+        "estimated_rows": root.get("Plan Rows"),
+        "full_scans": full_scans
+    }
+
+
+def summarize_mysql_plan(plan):
+    """Reduce EXPLAIN FORMAT=JSON output to estimated cost, result rows and full table scans."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    block = plan.get("query_block", {})
+    cost = block.get("cost_info", {}).get("query_cost")
+    full_scans = []
+    estimated_rows = None
+    nodes = [block]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        table = node.get("table")
+        if isinstance(table, dict) and "table_name" in table:
+            if table.get("access_type") == "ALL":
+                full_scans.append((table["table_name"], int(table.get("rows_examined_per_scan", 0))))
+            produced = table.get("rows_produced_per_join")
+            if produced is not None:
+                estimated_rows = max(estimated_rows or 0, int(produced))
+        nodes.extend(value for value in node.values() if isinstance(value, (dict, list)))
+    return {
+        "total_cost": float(cost) if cost is not None else None,
+        "estimated_rows": estimated_rows,
+        "full_scans": full_scans
+    }
+
+
+def plan_warnings(summary, max_cost=None, max_rows=None, scan_rows=None):
+    """List the reasons a plan looks too expensive to run unattended (empty when it is fine)."""
+    warnings = []
+    if max_cost and (summary.get("total_cost") or 0) > max_cost:
+        warnings.append(f"estimated cost {summary['total_cost']:,.0f} is above {max_cost:,.0f}")
+    if max_rows and (summary.get("estimated_rows") or 0) > max_rows:
+        warnings.append(f"about {summary['estimated_rows']:,} rows expected (limit {max_rows:,})")
+    if scan_rows:
+        for table, rows in summary.get("full_scans", []):
+            if rows > scan_rows:
+                warnings.append(f"full scan of {table} (~{rows:,} rows)")
+    return warnings
+
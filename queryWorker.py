@@ -0,0 +1,227 @@
+import os
+import queue
+
+from PySide6.QtCore import QThread, Signal
+
+
+class QueryWorker(QThread):
+    """Runs one SQL statement on its own connection so the GUI thread never blocks on the database.
+
+    After the first batch the worker keeps the result open and fetches further batches only
+    when fetch_more() is called (e.g. as the result grid is scrolled). It releases the
+    connection once the result is exhausted, close() is called or it sits idle for idle_timeout.
+
+    With a full_query the statement is treated as a preview of it: the connection is kept
+    after the preview and run_full() runs full_query on it. Once the worker has let go of
+    the connection (idle or closed), run_full() starts it again for full_query alone.
+    """
+    progress = Signal(str)
+    columns_ready = Signal(object)  # column names
+    batch_ready = Signal(object)  # list of rows
+    result_finished = Signal(object)  # fetch summary
+    error_occurred = Signal(str)
+    def __init__(self, db_manager, query: str, batch_size: int = 500, max_rows: int = None,
+                 count_total: bool = False, idle_timeout: float = 300,
+                 statement_timeout: float = None, read_only: bool = False, full_query: str = None):
+        super().__init__()
+        self.db_manager = db_manager
+        self.query = query
+        self.full_query = full_query
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+        self.count_total = count_total
+        self.idle_timeout = idle_timeout
+        self.statement_timeout = statement_timeout
+        self.read_only = read_only
+        self.connection = None
+        self._commands = queue.Queue()
+        self._cancelled = False
+
+    def fetch_more(self):
+        self._commands.put("more")
+
+    def run_full(self):
+        """Run full_query; returns False when it runs on a fresh start of the worker."""
+        if self.isRunning():
+            self._commands.put("full")
+            return True
+        self.query, self.full_query = self.full_query, None
+        self._commands = queue.Queue()
+        self._cancelled = False
+        self.start()
+        return False
+
+    def close(self):
+        self._commands.put("close")
+
+    def cancel(self):
+        self._cancelled = True
+        self._commands.put("close")
+        connection = self.connection
+        if connection is not None:
+            try:
+                self.db_manager.cancel_query(connection)
+            except Exception as e:
+                print(f"Failed to cancel query: {e}")
+
+    def run(self):
+        try:
+            self.progress.emit("Connecting...")
+            self.connection = self.db_manager.open_connection()
+            if self._cancelled:
+                raise RuntimeError("cancelled before execution")
+
+            self.progress.emit("Executing query...")
+            summary = self.stream(self.query, preview=self.full_query is not None)
+            if self.full_query is not None and not self._cancelled:
+                self.result_finished.emit(summary)
+                summary = None
+                # Hold on to the connection until the full query is asked for
+                while not self._cancelled:
+                    try:
+                        command = self._commands.get(timeout=self.idle_timeout)
+                    except queue.Empty:
+                        break
+                    if command == "close":
+                        break
+                    if command == "full":
+                        self.connection.rollback()  # the guards only apply to a fresh transaction
+                        self.progress.emit("Executing full query...")
+                        summary = self.stream(self.full_query)
+                        break
+
+            if self._cancelled:
+                self.error_occurred.emit("Query cancelled")
+            elif summary is not None:
+                self.result_finished.emit(summary)
+        except Exception as e:
+            if self._cancelled:
+                self.error_occurred.emit("Query cancelled")
+            else:
+                self.error_occurred.emit(self.db_manager.describe_error(e))
+        finally:
+            connection, self.connection = self.connection, None
+            if connection is not None:
+                connection.close()
+
+    def stream(self, query, preview=False):
+        """Stream query into the batch signals until it is exhausted, closed or idle."""
+        with self.db_manager.stream_query(
+            query,
+            batch_size=self.batch_size,
+            max_rows=self.max_rows,
+            count_total=self.count_total and not preview,
+            connection=self.connection,
+            statement_timeout=self.statement_timeout,
+            read_only=self.read_only
+        ) as stream:
+            self.columns_ready.emit(stream.columns)
+            self.batch_ready.emit(stream.fetch())
+            while not stream.exhausted and not self._cancelled:
+                try:
+                    command = self._commands.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    break
+                if command == "close" or self._cancelled:
+                    break
+                if command == "full":
+                    # Run the full query once this result is done with
+                    self._commands.put(command)
+                    break
+                self.batch_ready.emit(stream.fetch())
+
+            return {
+                "rows_fetched": stream.rows_fetched,
+                "total_rows": stream.total_rows,
+                "truncated": stream.truncated,
+                "exhausted": stream.exhausted,
+                "preview": preview
+            }
+
+
+class PreflightWorker(QThread):
+    """Asks the planner for a query's estimated cost in the background, without running it."""
+    plan_ready = Signal(object)  # plan summary, see DatabaseManager.explain_query
+    error_occurred = Signal(str)
+    def __init__(self, db_manager, query: str):
+        super().__init__()
+        self.db_manager = db_manager
+        self.query = query
+
+    def run(self):
+        try:
+            self.plan_ready.emit(self.db_manager.explain_query(self.query))
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+
+class ExportWorker(QThread):
+    """Streams the full result of a query into a file, one batch at a time.
+
+    Only one batch is held in memory, so the size of the export is not limited by RAM.
+    A cancelled or failed export removes the partial file.
+    """
+    progress = Signal(int)  # rows written so far
+    export_finished = Signal(object)  # {"path": ..., "rows": ...}
+    error_occurred = Signal(str)
+    def __init__(self, db_manager, query: str, path: str, batch_size: int = 10000,
+                 statement_timeout: float = None, read_only: bool = False):
+        super().__init__()
+        self.db_manager = db_manager
+        self.query = query
+        self.path = path
+        self.batch_size = batch_size
+        self.statement_timeout = statement_timeout
+        self.read_only = read_only
+        self.connection = None
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+        connection = self.connection
+        if connection is not None:
+            try:
+                self.db_manager.cancel_query(connection)
+            except Exception as e:
+                print(f"Failed to cancel export: {e}")
+
+    def run(self):
+        writer = None
+        rows_written = 0
+        try:
+            self.connection = self.db_manager.open_connection()
+            with self.db_manager.stream_query(
+                self.query,
+                batch_size=self.batch_size,
+                connection=self.connection,
+                statement_timeout=self.statement_timeout,
+                read_only=self.read_only
+            ) as stream:
+                from resultExport import open_export  # pyarrow is loaded for Parquet files only
+                writer = open_export(self.path, stream.columns)
+                while not stream.exhausted and not self._cancelled:
+                    rows = stream.fetch()
+                    writer.write_batch(rows)
+                    rows_written += len(rows)
+                    self.progress.emit(rows_written)
+            writer.close()
+            writer = None
+            if self._cancelled:
+                raise RuntimeError("cancelled")
+            self.export_finished.emit({"path": self.path, "rows": rows_written})
+        except Exception as e:
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            if self._cancelled:
+                self.error_occurred.emit("Export cancelled")
+            else:
+                self.error_occurred.emit(self.db_manager.describe_error(e))
+        finally:
+            connection, self.connection = self.connection, None
+            if connection is not None:
+                connection.close()
@@ -0,0 +1,105 @@
+import csv
+import importlib.util
+import json
+import os
+
+# pyarrow is optional (Parquet export) and slow to import; loaded by load_pyarrow() on first use
+pa = None
+pq = None
+
+EXPORT_FORMATS = {".csv": "CSV", ".jsonl": "JSON Lines", ".parquet": "Parquet"}
+
+
+def available_formats():
+    """Map of file extension -> format name, without Parquet when pyarrow is missing."""
+    has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+    return {ext: name for ext, name in EXPORT_FORMATS.items() if ext != ".parquet" or has_pyarrow}
+
+
+def load_pyarrow():
+    """Import pyarrow and pyarrow.parquet into pa / pq; False when pyarrow is not installed."""
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+
+class CsvExport:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesExport:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", encoding="utf-8")
+        self.columns = list(columns)
+
+    def write_batch(self, rows):
+        # Dates, decimals etc. are written as text
+        self.file.writelines(
+            json.dumps(dict(zip(self.columns, row)), default=str, ensure_ascii=False) + "\n" for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExport:
+    """Writes one row group per batch; column types come from the first batch."""
+    def __init__(self, path, columns):
+        if not load_pyarrow():
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self.columns = list(columns)
+        self.schema = None
+        self.writer = None
+
+    def write_batch(self, rows):
+        if not rows:
+            return
+        values = list(zip(*rows))
+        if self.schema is None:
+            fields = []
+            for name, column in zip(self.columns, values):
+                field_type = pa.array(column).type
+                # A column that is all NULL in the first batch could be anything later
+                fields.append(pa.field(name, pa.string() if pa.types.is_null(field_type) else field_type))
+            self.schema = pa.schema(fields)
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        arrays = []
+        for field, column in zip(self.schema, values):
+            if pa.types.is_string(field.type):
+                column = [None if value is None else str(value) for value in column]
+            arrays.append(pa.array(column, type=field.type))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        if self.writer is None:
+            # Nothing was written: still leave a valid file with the column names
+            self.schema = pa.schema([pa.field(name, pa.string()) for name in self.columns])
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        self.writer.close()
+
+
+EXPORTERS = {".csv": CsvExport, ".jsonl": JsonLinesExport, ".parquet": ParquetExport}
+
+
+def open_export(path, columns):
+    """Return a writer for path, picked by its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f"Unsupported export format '{extension}' (use {', '.join(EXPORTERS)})")
+    return EXPORTERS[extension](path, columns)
@@ -0,0 +1,157 @@
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+
+
+def format_cell(value):
+    if value is None:
+        return "NULL"
+    return str(value)
+
+
+class RowStore:
+    """Result rows as the driver returned them (tuples); cells are formatted when drawn."""
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.rows = []
+
+    def append(self, rows):
+        self.rows.extend(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def text(self, row, column):
+        return format_cell(self.rows[row][column])
+
+    def value(self, row, column):
+        return self.rows[row][column]
+
+    def sort_order(self, column, descending=False):
+        rows = self.rows
+        try:
+            return sorted(range(len(rows)), key=lambda row: (rows[row][column] is None, rows[row][column] if rows[row][column] is not None else 0), reverse=descending)
+        except TypeError:
+            # Mixed types in one column; fall back to text order
+            return sorted(range(len(rows)), key=lambda row: (rows[row][column] is None, format_cell(rows[row][column])), reverse=descending)
+
+    def stats(self, column):
+        values = [row[column] for row in self.rows if row[column] is not None]
+        stats = {"nulls": len(self.rows) - len(values), "min": None, "max": None}
+        if values:
+            try:
+                stats["min"], stats["max"] = min(values), max(values)
+            except TypeError:
+                texts = [format_cell(value) for value in values]
+                stats["min"], stats["max"] = min(texts), max(texts)
+        return stats
+
+    def iter_rows(self, order=None):
+        return iter(self.rows) if order is None else (self.rows[row] for row in order)
+
+
+class ResultTableModel(QAbstractTableModel):
+    """Table model over a query result that is fetched from the database on demand.
+
+    The view calls fetchMore() as the user scrolls; the model then asks its source
+    (a QueryWorker) for the next batch and appends it once it arrives. Rows are kept as
+    the driver's tuples in a RowStore; cells are formatted when the view asks.
+    """
+    fetch_more_requested = Signal()
+
+    def __init__(self, columns=(), parent=None):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self.store = RowStore(self.columns)
+        self.has_more = True
+        self._pending = False
+        self._sort_column = None
+        self._sort_order = Qt.AscendingOrder
+        self._order = None  # view row -> store row while sorted
+        self._stats = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            row = index.row() if self._order is None else int(self._order[index.row()])
+            return self.store.text(row, index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.ToolTipRole and section < len(self.columns):
+            stats = self.column_stats(section)
+            return f"min: {format_cell(stats['min'])}\nmax: {format_cell(stats['max'])}\nnulls: {stats['nulls']:,}"
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        return section + 1
+
+    def column_stats(self, column):
+        """min / max / NULL count over the rows loaded so far."""
+        if column not in self._stats:
+            self._stats[column] = self.store.stats(column)
+        return self._stats[column]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and not self._pending
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._pending = True
+            self.fetch_more_requested.emit()
+
+    def set_columns(self, columns):
+        self.beginResetModel()
+        self.columns = list(columns)
+        self.store = RowStore(self.columns)
+        self._order = None
+        self._stats = {}
+        self.has_more = True
+        self._pending = False
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        self._pending = False
+        if not rows:
+            return
+        start = len(self.store)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self.store.append(rows)
+        self._stats = {}
+        if self._order is not None:
+            # New rows show at the end until the re-sort below
+            self._order = list(self._order) + list(range(start, start + len(rows)))
+        self.endInsertRows()
+        if self._sort_column is not None:
+            # Keep the loaded rows in the user's chosen order
+            self.layoutAboutToBeChanged.emit()
+            self._sort_rows()
+            self.layoutChanged.emit()
+
+    def iter_rows(self):
+        """Loaded rows as tuples, in the order shown."""
+        return self.store.iter_rows(self._order)
+
+    def finish(self):
+        """Called when the source has no more rows (or was closed)."""
+        self.has_more = False
+        self._pending = False
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # Sorts the rows loaded so far; no re-query
+        if column < 0 or column >= len(self.columns):
+            return
+        self._sort_column = column
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        self._sort_rows()
+        self.layoutChanged.emit()
+
+    def _sort_rows(self):
+        self._order = self.store.sort_order(self._sort_column, descending=self._sort_order == Qt.DescendingOrder)
@@ -0,0 +1,155 @@
+import math
+import re
+import threading
+from collections import Counter
+
+
+def tokenize(text):
+    """Split identifiers and prose into lowercase terms (snake_case and camelCase aware)."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text or "")
+    return [stem(token) for token in re.findall(r"[a-z0-9]+", text.lower())]
+
+
+def stem(token):
+    # Just enough stemming to match "orders" with "order" and "categories" with "category"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+class SchemaIndex:
+    """BM25 index over table names, column names and comments of a cached schema.
+
+    Used to send only the tables relevant to a question (plus their foreign-key
+    neighbours) to the model instead of the whole database schema.
+    """
+
+    TABLE_NAME_WEIGHT = 3
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, schema):
+        self.fingerprint = schema.get("fingerprint")
+        self.tables = schema["tables"]
+        self.columns = schema["columns"]
+        self.foreign_keys = schema.get("foreign_keys", {})
+        self.table_comments = schema.get("table_comments", {})
+
+        # Foreign-key neighbours in both directions
+        self.neighbours = {table: set() for table in self.tables}
+        for table, references in self.foreign_keys.items():
+            for _column, ref_table, _ref_column in references:
+                if ref_table in self.neighbours and ref_table != table:
+                    self.neighbours.setdefault(table, set()).add(ref_table)
+                    self.neighbours[ref_table].add(table)
+
+        self.blocks = {table: self.format_table(table) for table in self.tables}
+
+        self.term_freqs = {}
+        self.doc_lengths = {}
+        doc_freqs = Counter()
+        for table in self.tables:
+            terms = tokenize(table) * self.TABLE_NAME_WEIGHT
+            terms += tokenize(self.table_comments.get(table))
+            for col in self.columns.get(table, []):
+                terms += tokenize(col[0])
+                if len(col) > 4:
+                    terms += tokenize(col[4])
+            counts = Counter(terms)
+            self.term_freqs[table] = counts
+            self.doc_lengths[table] = len(terms)
+            doc_freqs.update(counts.keys())
+
+        total = len(self.tables)
+        self.avg_length = (sum(self.doc_lengths.values()) / total) if total else 0
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in doc_freqs.items()
+        }
+
+    def format_table(self, table):
+        references = {fk[0]: fk for fk in self.foreign_keys.get(table, [])}
+        block = f"\nTable: {table}\n"
+        if self.table_comments.get(table):
+            block += f"-- {self.table_comments[table]}\n"
+        for col in self.columns.get(table, []):
+            notes = [col[1]]
+            if col[3] == "PRI":
+                notes.append("PK")
+            if col[0] in references:
+                notes.append(f"FK -> {references[col[0]][1]}.{references[col[0]][2]}")
+            block += f"- {col[0]} ({', '.join(notes)})"
+            if len(col) > 4 and col[4]:
+                block += f" -- {col[4]}"
+            block += "\n"
+        return block
+
+    def score(self, question):
+        terms = set(tokenize(question))
+        scores = {}
+        for table in self.tables:
+            counts = self.term_freqs[table]
+            length_norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[table] / (self.avg_length or 1))
+            total = 0.0
+            for term in terms:
+                freq = counts.get(term)
+                if freq:
+                    total += self.idf[term] * freq * (self.K1 + 1) / (freq + length_norm)
+            if total > 0:
+                scores[table] = total
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def select_tables(self, question, top_k=8, token_budget=3000):
+        """Pick the top_k matching tables, then their FK neighbours, until token_budget is spent."""
+        full_size = sum(estimate_tokens(block) for block in self.blocks.values())
+        if full_size <= token_budget:
+            return list(self.tables)
+
+        ranked = [table for table, _score in self.score(question)[:top_k]]
+        candidates = list(ranked)
+        for table in ranked:
+            candidates.extend(sorted(self.neighbours.get(table, ())))
+        if not candidates:
+            # Nothing matched; fall back to the schema order
+            candidates = list(self.tables)
+
+        selected = []
+        used = 0
+        for table in candidates:
+            if table in selected:
+                continue
+            size = estimate_tokens(self.blocks[table])
+            if used + size > token_budget:
+                continue
+            selected.append(table)
+            used += size
+        return selected
+
+    def build_context(self, question, top_k=8, token_budget=3000):
+        """Return (schema_str, tables) restricted to the tables relevant to question."""
+        tables = self.select_tables(question, top_k=top_k, token_budget=token_budget)
+        return "".join(self.blocks[table] for table in tables), tables
+
+
+class SchemaContext:
+    """Picks the prompt schema for questions, keeping one SchemaIndex per schema fingerprint.
+
+    Safe to share between threads; the index is rebuilt once when the schema changes.
+    """
+    def __init__(self):
+        self.index = None
+        self._lock = threading.Lock()
+
+    def build(self, schema, question, top_k=8, token_budget=3000):
+        """Return (schema_str, tables) for question, see SchemaIndex.build_context."""
+        with self._lock:
+            if self.index is None or self.index.fingerprint != schema["fingerprint"]:
+                self.index = SchemaIndex(schema)
+            index = self.index
+        return index.build_context(question, top_k=top_k, token_budget=token_budget)
@@ -0,0 +1,94 @@
+import logging
+import re
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+# sqlglot logs a warning for every construct it cannot translate exactly
+logging.getLogger("sqlglot").setLevel(logging.ERROR)
+
+DIALECTS = {"postgresql": "postgres", "mysql": "mysql"}
+
+
+def parse_query(sql, db_type):
+    """Parse a single statement, or return None when sqlglot cannot make sense of it."""
+    try:
+        return sqlglot.parse_one(sql, read=DIALECTS.get(db_type, db_type))
+    except SqlglotError:
+        return None
+
+
+def strip_statement(sql):
+    return re.sub(r"[;\s]+$", "", sql.strip())
+
+
+def limit_query(sql, limit, db_type):
+    """Return sql rewritten so its outermost query returns at most limit rows.
+
+    A plain SELECT, CTE or UNION without a LIMIT gets one appended, one that already
+    has a LIMIT no larger than limit is left alone, and anything else (bigger or
+    parameterised limits, parenthesised queries) is wrapped in a subquery. Returns
+    None for statements that are not queries, e.g. SELECT ... INTO or SELECT ... FOR UPDATE.
+    """
+    sql = strip_statement(sql)
+    tree = parse_query(sql, db_type)
+    if not isinstance(tree, exp.Query) or tree.args.get("into") or tree.args.get("locks"):
+        return None
+
+    existing = tree.args.get("limit")
+    if existing is not None:
+        count = existing.args.get("count") if isinstance(existing, exp.Fetch) else existing.expression
+        if isinstance(count, exp.Literal) and count.is_int and int(count.this) <= limit:
+            return sql
+    elif not isinstance(tree, exp.Subquery):
+        # Appended on its own line so a trailing -- comment cannot swallow it
+        return f"{sql}\nLIMIT {int(limit)}"
+    return f"SELECT * FROM (\n{sql}\n) AS preview LIMIT {int(limit)}"
+
+
+def is_aggregate(sql, db_type):
+    """True when the outermost SELECT groups or aggregates, so a LIMIT would not make it cheaper."""
+    tree = parse_query(strip_statement(sql), db_type)
+    if not isinstance(tree, exp.Select):
+        return False
+    return bool(tree.args.get("group")) or any(
+        select.find(exp.AggFunc) for select in tree.expressions
+    )
+
+
+def sample_query(sql, percent, db_type):
+    """Return sql with TABLESAMPLE SYSTEM (percent) on every base table (PostgreSQL only).
+
+    Aggregates over the sample are estimates. Returns None when sampling does not apply.
+    """
+    if db_type != "postgresql":
+        return None
+    tree = parse_query(strip_statement(sql), db_type)
+    if not isinstance(tree, exp.Query) or tree.args.get("into") or tree.args.get("locks"):
+        return None
+
+    cte_names = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+    sampled = False
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier) or table.name in cte_names or table.args.get("sample"):
+            continue
+        table.set("sample", exp.TableSample(method=exp.var("SYSTEM"), percent=exp.Literal.number(percent)))
+        sampled = True
+    return tree.sql(dialect=DIALECTS[db_type]) if sampled else None
+
+
+def preview_query(sql, db_type, limit=100, sample_percent=None):
+    """Build the preview variant of sql; returns (preview_sql, description) or (None, None).
+
+    Aggregates are sampled when sample_percent is given (PostgreSQL), everything else is
+    limited to limit rows.
+    """
+    if sample_percent and is_aggregate(sql, db_type):
+        sampled = sample_query(sql, sample_percent, db_type)
+        if sampled is not None:
+            return limit_query(sampled, limit, db_type), f"~{sample_percent:g}% sample of each table"
+    limited = limit_query(sql, limit, db_type)
+    if limited is None or limited == strip_statement(sql):
+        return None, None
+    return limited, f"first {limit:,} rows"
@@ -0,0 +1,173 @@
+import threading
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, SqlglotError
+from sqlglot.optimizer.scope import Scope, traverse_scope
+
+from sqlRewrite import DIALECTS
+
+# Catalog schemas the introspected schema does not cover; references into them are not checked
+SYSTEM_SCHEMAS = {"information_schema", "pg_catalog", "mysql", "performance_schema", "sys"}
+
+
+def describe_parse_error(error):
+    if isinstance(error, ParseError) and error.errors:
+        first = error.errors[0]
+        return f"Syntax error at line {first.get('line')}, column {first.get('col')}: {first.get('description')}"
+    return f"Syntax error: {error}"
+
+
+class SchemaCatalog:
+    """Lower-cased table -> column names of a cached schema (see DatabaseManager.get_schema)."""
+    def __init__(self, schema):
+        self.fingerprint = schema.get("fingerprint")
+        self.columns = {
+            table.lower(): {column[0].lower() for column in columns}
+            for table, columns in schema["columns"].items()
+        }
+        for table in schema["tables"]:
+            self.columns.setdefault(table.lower(), set())
+
+    def has_table(self, name):
+        return name.lower() in self.columns
+
+    def table_columns(self, name):
+        return self.columns.get(name.lower())
+
+
+def source_columns(source, catalog):
+    """Column names a FROM source provides, or None when they cannot be known."""
+    if isinstance(source, exp.Table):
+        if not isinstance(source.this, exp.Identifier) or source.db.lower() in SYSTEM_SCHEMAS:
+            return None
+        return catalog.table_columns(source.name)
+    if isinstance(source, Scope) and isinstance(source.expression, exp.Select):
+        if source.expression.is_star:
+            return None
+        return {name.lower() for name in source.expression.named_selects}
+    return None
+
+
+def visible_sources(scope):
+    """Sources of scope and of the scopes around it, innermost first (for correlated subqueries)."""
+    while scope is not None:
+        yield from scope.sources.items()
+        scope = scope.parent
+
+
+def check_references(tree, catalog):
+    problems = []
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier) or table.db.lower() in SYSTEM_SCHEMAS:
+            continue
+        if table.name.lower() not in cte_names and not catalog.has_table(table.name):
+            problems.append(f"Unknown table: {table.name}")
+
+    for scope in traverse_scope(tree):
+        sources = list(visible_sources(scope))
+        select = scope.expression if isinstance(scope.expression, exp.Select) else None
+        aliases = {e.alias.lower() for e in select.expressions if isinstance(e, exp.Alias)} if select is not None else set()
+        for column in scope.columns:
+            name = column.name.lower()
+            if not name or column.find(exp.Star):
+                continue
+            if select is not None and column.find_ancestor(exp.Select) is not select:
+                continue  # listed in the outer scope too, checked with its own subquery
+            if column.table:
+                alias = column.table.lower()
+                matches = [source for source_alias, source in sources if source_alias.lower() == alias]
+                if not matches:
+                    problems.append(f"Unknown table or alias: {column.table} (in {column.sql()})")
+                    continue
+                columns = source_columns(matches[0], catalog)
+                if columns is not None and name not in columns:
+                    problems.append(f"Unknown column: {column.sql()}")
+                continue
+
+            if name in aliases:
+                continue  # e.g. GROUP BY / ORDER BY an output column
+            candidates = [source_columns(source, catalog) for _alias, source in sources]
+            if not candidates or any(columns is None for columns in candidates):
+                continue  # a source with unknown columns could provide it
+            if not any(name in columns for columns in candidates):
+                problems.append(f"Unknown column: {column.name}")
+    return problems
+
+
+def check_target_columns(tree, catalog):
+    """Check the columns an INSERT, UPDATE or DELETE names on its target table (outside subqueries)."""
+    target = tree.this.this if isinstance(tree.this, exp.Schema) else tree.this
+    if not isinstance(target, exp.Table):
+        return []
+    columns = source_columns(target, catalog)
+    if columns is None:
+        return []  # an unknown table is reported by check_references
+    names = {target.name.lower(), target.alias_or_name.lower()}
+    # With UPDATE ... FROM or DELETE ... USING an unqualified column may belong to another table
+    joined = any(
+        table is not target and table.find_ancestor(exp.Select) is None
+        for table in tree.find_all(exp.Table)
+    )
+
+    problems = []
+    if isinstance(tree.this, exp.Schema):
+        problems.extend(
+            f"Unknown column: {target.name}.{identifier.name}"
+            for identifier in tree.this.expressions if identifier.name.lower() not in columns
+        )
+    for column in tree.find_all(exp.Column):
+        if column.find_ancestor(exp.Select) is not None or column.find(exp.Star):
+            continue  # subqueries are checked with their own scope
+        if (column.table and column.table.lower() not in names) or (not column.table and joined):
+            continue
+        if column.name.lower() not in columns:
+            problems.append(f"Unknown column: {column.sql()}")
+    return problems
+
+
+def validate_sql(sql, schema, db_type, catalog=None):
+    """Parse sql for db_type and check its table and column references against schema.
+
+    Returns a list of problems, empty when the SQL looks valid. The checks err on the
+    side of accepting: references that cannot be resolved locally (table functions,
+    SELECT * subqueries, catalog schemas) are not reported.
+    """
+    catalog = catalog or SchemaCatalog(schema)
+    try:
+        statements = [tree for tree in sqlglot.parse(sql, read=DIALECTS.get(db_type, db_type)) if tree is not None]
+    except SqlglotError as e:
+        return [describe_parse_error(e)]
+    if not statements:
+        return ["No SQL statement found"]
+
+    problems = []
+    for tree in statements:
+        if isinstance(tree, (exp.Alias, exp.Column, exp.Identifier)):
+            # What sqlglot makes of a misspelled keyword, e.g. "SELEC * FRM x"
+            problems.append(f"Not a valid SQL statement: {tree.sql()}")
+        elif isinstance(tree, (exp.Query, exp.Insert, exp.Update, exp.Delete)):
+            problems.extend(check_references(tree, catalog))
+            if not isinstance(tree, exp.Query):
+                problems.extend(check_target_columns(tree, catalog))
+    # Keep the first occurrence of each problem, in order
+    return list(dict.fromkeys(problems))
+
+
+class SqlValidator:
+    """validate_sql for one database type, keeping the catalog of the current schema fingerprint.
+
+    Safe to share between threads.
+    """
+    def __init__(self, db_type):
+        self.db_type = db_type
+        self.catalog = None
+        self._lock = threading.Lock()
+
+    def validate(self, sql, schema):
+        with self._lock:
+            if self.catalog is None or self.catalog.fingerprint != schema.get("fingerprint"):
+                self.catalog = SchemaCatalog(schema)
+            catalog = self.catalog
+        return validate_sql(sql, schema, self.db_type, catalog=catalog)
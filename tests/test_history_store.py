@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from historyStore import HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite"), flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def written(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT question FROM history ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def test_search_matches_every_term_as_a_prefix(store):
+    store.record(question="total sales per region", sql="SELECT region, SUM(amount) FROM sales GROUP BY region")
+    store.record(question="customers without orders", sql="SELECT * FROM customers")
+    store.record(question="sales last month", sql="SELECT * FROM sales WHERE month = 9")
+    store.flush()
+
+    assert [entry["question"] for entry in store.search("sal regi")] == ["total sales per region"]
+    assert {entry["question"] for entry in store.search("sales")} == {"total sales per region", "sales last month"}
+    # SQL is indexed as well as the question
+    assert [entry["question"] for entry in store.search("customers")] == ["customers without orders"]
+    assert store.search("inventory") == []
+
+
+def test_empty_search_returns_recent_entries_first(store):
+    for question in ("first", "second", "third"):
+        store.record(question=question)
+        store.flush()
+    assert [entry["question"] for entry in store.search("")] == ["third", "second", "first"]
+    assert [entry["question"] for entry in store.search(None, limit=1)] == ["third"]
+
+
+def test_update_reaches_the_search_index(store):
+    key = store.record(question="top products", sql="SELECT 1")
+    store.update(key, sql="SELECT name FROM products", row_count=12, ignored="dropped")
+    store.flush()
+
+    [entry] = store.search("products name")
+    assert entry["key"] == key
+    assert entry["row_count"] == 12
+    assert store.search("ignored dropped") == []
+
+
+def test_writes_wait_for_a_full_batch(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    store = HistoryStore(path, flush_interval=60, batch_size=3)
+    try:
+        store.record(question="one")
+        store.record(question="two")
+        time.sleep(0.1)
+        assert written(path) == []
+
+        store.record(question="three")
+        deadline = time.monotonic() + 5
+        while not written(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert written(path) == [("one",), ("two",), ("three",)]
+    finally:
+        store.close()
+
+
+def test_close_writes_what_is_queued(tmp_path):
+    path = str(tmp_path / "history.sqlite")
+    store = HistoryStore(path, flush_interval=60)
+    store.record(question="queued")
+    store.close()
+
+    assert not store._writer.is_alive()
+    assert written(path) == [("queued",)]
+    # The database is complete on disk for the next session
+    reopened = HistoryStore(path)
+    try:
+        assert [entry["question"] for entry in reopened.search("queued")] == ["queued"]
+    finally:
+        reopened.close()
@@ -0,0 +1,84 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import queryCache
+from queryCache import QueryCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(queryCache.time, "time", lambda: now[0])
+    return now
+
+
+def open_cache(tmp_path, **kwargs):
+    return QueryCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_rewording_hits_the_same_entry(tmp_path, clock):
+    cache = open_cache(tmp_path)
+    cache.put("How many orders?", "llama3", "fp1", "SELECT COUNT(*) FROM orders")
+    assert cache.get("how many  ORDERS", "llama3", "fp1") == ("SELECT COUNT(*) FROM orders", "how many orders")
+    cache.close()
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = open_cache(tmp_path, max_entries=2)
+    cache.put("first", "llama3", "fp1", "SELECT 1")
+    clock[0] += 1
+    cache.put("second", "llama3", "fp1", "SELECT 2")
+    clock[0] += 1
+    assert cache.get("first", "llama3", "fp1")  # now used more recently than "second"
+    clock[0] += 1
+    cache.put("third", "llama3", "fp1", "SELECT 3")
+
+    assert cache.get("second", "llama3", "fp1") is None
+    assert cache.get("first", "llama3", "fp1") == ("SELECT 1", "first")
+    assert cache.get("third", "llama3", "fp1") == ("SELECT 3", "third")
+    cache.close()
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = open_cache(tmp_path, ttl_seconds=60)
+    cache.put("total sales", "llama3", "fp1", "SELECT SUM(amount) FROM sales")
+    clock[0] += 59
+    assert cache.get("total sales", "llama3", "fp1")
+    # Using an entry does not extend its life
+    clock[0] += 2
+    assert cache.get("total sales", "llama3", "fp1") is None
+    cache.close()
+
+
+def test_fuzzy_hit_returns_the_cached_question(tmp_path, clock):
+    cache = open_cache(tmp_path, fuzzy_threshold=0.9)
+    cache.put("list all customers in germany", "llama3", "fp1", "SELECT * FROM customers WHERE country = 'DE'")
+    assert cache.get("list all the customers in germany", "llama3", "fp1") == (
+        "SELECT * FROM customers WHERE country = 'DE'", "list all customers in germany"
+    )
+    cache.close()
+
+
+def test_fuzzy_miss_below_the_threshold(tmp_path, clock):
+    cache = open_cache(tmp_path, fuzzy_threshold=0.9)
+    cache.put("list all customers in germany", "llama3", "fp1", "SELECT * FROM customers WHERE country = 'DE'")
+    assert cache.get("list all customers in france", "llama3", "fp1") is None
+    # Without a threshold only exact (normalized) questions match
+    exact = open_cache(tmp_path)
+    assert exact.get("list all the customers in germany", "llama3", "fp1") is None
+    exact.close()
+    cache.close()
+
+
+def test_changed_fingerprint_or_model_misses(tmp_path, clock):
+    cache = open_cache(tmp_path, fuzzy_threshold=0.5)
+    cache.put("how many orders", "llama3", "fp1", "SELECT COUNT(*) FROM orders")
+    assert cache.get("how many orders", "llama3", "fp2") is None
+    assert cache.get("how many orders", "mistral", "fp1") is None
+    assert cache.get("how many orders", "llama3", "fp1") == ("SELECT COUNT(*) FROM orders", "how many orders")
+    cache.close()
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from sqlite_db import SQLiteDatabaseManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = str(tmp_path / "ten.sqlite")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE t (i INTEGER)")
+        connection.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    connection.close()
+    manager = SQLiteDatabaseManager(path)
+    manager.connect()
+    yield manager
+    manager.close()
+
+
+def stream(manager, **kwargs):
+    with manager.stream_query("SELECT i FROM t ORDER BY i", **kwargs) as result:
+        rows = [row[0] for batch in result for row in batch]
+    return rows, result
+
+
+@pytest.mark.parametrize("batch_size", [3, 4, 5, 500])
+def test_cap_inside_a_batch_is_truncated(manager, batch_size):
+    rows, result = stream(manager, batch_size=batch_size, max_rows=5, count_total=True, read_only=True)
+    assert rows == [0, 1, 2, 3, 4]
+    assert result.truncated
+    assert result.total_rows == 10
+
+
+def test_cap_at_the_end_of_the_result_is_not_truncated(manager):
+    rows, result = stream(manager, batch_size=3, max_rows=10)
+    assert rows == list(range(10))
+    assert not result.truncated
+    assert result.total_rows == 10
+
+
+def test_count_needs_read_only(manager):
+    # Counting re-runs the statement, which is only done when it cannot write
+    rows, result = stream(manager, batch_size=3, max_rows=5, count_total=True)
+    assert len(rows) == 5
+    assert result.truncated
+    assert result.total_rows is None
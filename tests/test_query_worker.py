@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication, Qt
+
+from queryWorker import QueryWorker
+from sqlite_db import SQLiteDatabaseManager
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = str(tmp_path / "orders.sqlite")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("CREATE TABLE orders (id INTEGER)")
+        connection.executemany("INSERT INTO orders VALUES (?)", [(i,) for i in range(250)])
+    connection.close()
+    manager = SQLiteDatabaseManager(path)
+    manager.connect()
+    yield manager
+    manager.close()
+
+
+def preview_worker(manager, idle_timeout):
+    worker = QueryWorker(
+        manager,
+        "SELECT id FROM orders LIMIT 100",
+        batch_size=500,
+        idle_timeout=idle_timeout,
+        full_query="SELECT id FROM orders"
+    )
+    results = {"rows": [], "summaries": [], "errors": []}
+    # Collected on the worker thread; the tests wait on the thread instead of running an event loop
+    worker.columns_ready.connect(lambda columns: results["rows"].clear(), Qt.DirectConnection)
+    worker.batch_ready.connect(results["rows"].extend, Qt.DirectConnection)
+    worker.result_finished.connect(results["summaries"].append, Qt.DirectConnection)
+    worker.error_occurred.connect(results["errors"].append, Qt.DirectConnection)
+    return worker, results
+
+
+def test_run_full_on_the_preview_connection(app, manager):
+    worker, results = preview_worker(manager, idle_timeout=5)
+    worker.start()
+    while not results["summaries"]:
+        worker.wait(10)
+    assert worker.run_full()
+    assert worker.wait(5000)
+    assert len(results["rows"]) == 250
+    assert [summary["preview"] for summary in results["summaries"]] == [True, False]
+
+
+def test_run_full_after_the_preview_worker_expired(app, manager):
+    worker, results = preview_worker(manager, idle_timeout=0.1)
+    worker.start()
+    assert worker.wait(5000)
+    assert len(results["rows"]) == 100
+
+    # The worker has let go of its connection; run_full starts it again for the full query
+    assert not worker.run_full()
+    assert worker.wait(5000)
+    assert not results["errors"]
+    assert len(results["rows"]) == 250
+    assert results["summaries"][-1]["preview"] is False
+    assert worker.full_query is None
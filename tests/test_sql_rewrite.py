@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pytest
+import sqlglot
+from sqlglot import exp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlRewrite import DIALECTS, preview_query
+
+DB_TYPES = sorted(DIALECTS)
+
+
+def outer_limit(sql, db_type):
+    """The LIMIT of the outermost query, parsed back in the same dialect."""
+    tree = sqlglot.parse_one(sql, read=DIALECTS[db_type])
+    return int(tree.args["limit"].expression.this)
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM orders",
+    "SELECT id FROM orders;",
+    "SELECT id FROM orders -- latest first",
+    "SELECT id FROM orders UNION SELECT id FROM customers",
+    "(SELECT id FROM orders LIMIT 5) UNION ALL (SELECT id FROM customers)",
+    "WITH big AS (SELECT * FROM orders WHERE amount > 10) SELECT * FROM big",
+    "SELECT name FROM customers WHERE id IN (SELECT customer_id FROM orders)",
+    "SELECT * FROM (SELECT id FROM orders LIMIT 1000) AS o",
+])
+def test_limit_is_appended_to_the_outer_query(sql, db_type):
+    preview, note = preview_query(sql, db_type, limit=100)
+    assert preview.startswith(sql.rstrip(";"))
+    assert outer_limit(preview, db_type) == 100
+    assert note == "first 100 rows"
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM orders LIMIT 1000",
+    "SELECT id FROM orders UNION SELECT id FROM customers LIMIT 500",
+    "(SELECT id FROM orders)",
+])
+def test_larger_limits_and_parenthesised_queries_are_wrapped(sql, db_type):
+    preview, _note = preview_query(sql, db_type, limit=100)
+    assert preview == f"SELECT * FROM (\n{sql}\n) AS preview LIMIT 100"
+    assert outer_limit(preview, db_type) == 100
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM orders LIMIT 10",
+    "SELECT id FROM orders LIMIT 5 OFFSET 10",
+    "SELECT id FROM orders UNION SELECT id FROM customers LIMIT 100",
+    # Not plain queries
+    "SELECT id FROM orders FOR UPDATE",
+    "DELETE FROM orders",
+    "not sql at all (",
+])
+def test_no_preview_when_it_would_not_help(sql, db_type):
+    assert preview_query(sql, db_type, limit=100) == (None, None)
+
+
+def test_aggregates_are_sampled_on_postgresql():
+    sql = "WITH recent AS (SELECT * FROM orders) SELECT r.region, SUM(o.amount) FROM recent o JOIN regions r ON r.id = o.region_id GROUP BY r.region"
+    preview, note = preview_query(sql, "postgresql", limit=100, sample_percent=5)
+    tree = sqlglot.parse_one(preview, read="postgres")
+    sampled = {table.name for table in tree.find_all(exp.Table) if table.args.get("sample")}
+    assert sampled == {"orders", "regions"}  # base tables, not the CTE
+    assert outer_limit(preview, "postgresql") == 100
+    assert note == "~5% sample of each table"
+
+
+def test_aggregates_are_limited_where_sampling_does_not_apply():
+    sql = "SELECT region, SUM(amount) FROM orders GROUP BY region"
+    assert preview_query(sql, "mysql", limit=100, sample_percent=5) == (f"{sql}\nLIMIT 100", "first 100 rows")
+    # Without GROUP BY or an aggregate the query is only limited
+    sql = "SELECT id FROM orders"
+    assert preview_query(sql, "postgresql", limit=100, sample_percent=5) == (f"{sql}\nLIMIT 100", "first 100 rows")
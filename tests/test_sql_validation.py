@@ -0,0 +1,77 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlValidation import SqlValidator, validate_sql
+
+SCHEMA = {
+    "tables": ["orders", "customers"],
+    "columns": {
+        "orders": [("id", "integer"), ("customer_id", "integer"), ("amount", "numeric")],
+        "customers": [("id", "integer"), ("Name", "text")],
+    },
+    "foreign_keys": [],
+    "fingerprint": "fp1",
+}
+
+DB_TYPES = ["postgresql", "mysql"]
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql", [
+    "SELECT c.name, SUM(o.amount) AS total FROM customers c JOIN orders o ON o.customer_id = c.id GROUP BY c.name ORDER BY total DESC",
+    "WITH big AS (SELECT customer_id, SUM(amount) AS total FROM orders GROUP BY customer_id) SELECT c.name, b.total FROM customers c JOIN big b ON b.customer_id = c.id",
+    "SELECT name FROM customers c WHERE EXISTS (SELECT 1 FROM orders o WHERE o.customer_id = c.id)",
+    "SELECT * FROM information_schema.tables",
+    "UPDATE orders SET amount = 0 WHERE customer_id IN (SELECT id FROM customers)",
+])
+def test_valid_sql_has_no_problems(sql, db_type):
+    assert validate_sql(sql, SCHEMA, db_type) == []
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql, problem", [
+    ("SELECT id FROM payments", "Unknown table: payments"),
+    ("SELECT o.id FROM orders o JOIN payments p ON p.order_id = o.id", "Unknown table: payments"),
+    ("SELECT total FROM orders", "Unknown column: total"),
+    ("SELECT o.total FROM orders o", "Unknown column: o.total"),
+    ("SELECT x.id FROM orders o", "Unknown table or alias: x (in x.id)"),
+    ("SELECT name FROM customers WHERE id IN (SELECT buyer_id FROM orders)", "Unknown column: buyer_id"),
+])
+def test_unknown_references(sql, problem, db_type):
+    assert validate_sql(sql, SCHEMA, db_type) == [problem]
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql, problem", [
+    ("INSERT INTO payments (id) VALUES (1)", "Unknown table: payments"),
+    ("INSERT INTO orders (total) VALUES (1)", "Unknown column: orders.total"),
+    ("UPDATE orders SET total = 1", "Unknown column: total"),
+    ("UPDATE orders SET amount = 1 WHERE buyer_id = 2", "Unknown column: buyer_id"),
+    ("DELETE FROM orders WHERE buyer_id = 1", "Unknown column: buyer_id"),
+])
+def test_data_changes_are_checked_against_their_table(sql, problem, db_type):
+    assert validate_sql(sql, SCHEMA, db_type) == [problem]
+
+
+@pytest.mark.parametrize("db_type", DB_TYPES)
+@pytest.mark.parametrize("sql, problem", [
+    ("", "No SQL statement found"),
+    ("SELEC * FRM orders", "Not a valid SQL statement"),
+    ("hello there", "Not a valid SQL statement"),
+    ("SELECT id FROM", "Syntax error at line 1"),
+])
+def test_text_that_is_not_a_statement_is_rejected(sql, problem, db_type):
+    [found] = validate_sql(sql, SCHEMA, db_type)
+    assert found.startswith(problem)
+
+
+def test_validator_reloads_the_catalog_for_a_new_fingerprint():
+    validator = SqlValidator("postgresql")
+    assert validator.validate("SELECT id FROM payments", SCHEMA) == ["Unknown table: payments"]
+    changed = dict(SCHEMA, tables=SCHEMA["tables"] + ["payments"], columns=dict(SCHEMA["columns"], payments=[("id", "integer")]), fingerprint="fp2")
+    assert validator.validate("SELECT id FROM payments", changed) == []
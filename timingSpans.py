@@ -0,0 +1,161 @@
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import QueueListener, RotatingFileHandler
+
+# Shown in the breakdown instead of the span name
+SPAN_LABELS = {
+    "schema": "Schema lookup",
+    "cache": "Cache lookup",
+    "schema_context": "Schema selection",
+    "agent.queue": "Waiting for agent",
+    "prompt": "Prompt build",
+    "llm.first_token": "First token",
+    "llm.generate": "Generation (total)",
+    "ollama.load": "  model load",
+    "ollama.prompt_eval": "  prompt eval",
+    "ollama.eval": "  token generation",
+    "sql.validate": "SQL validation",
+    "ui.answer": "Show answer",
+    "sql.preview": "Preview rewrite",
+    "db.preflight": "Query plan check",
+    "db.execute": "Execute",
+    "db.first_batch": "First rows",
+    "ui.rows": "Show first rows",
+}
+
+
+def format_duration(seconds):
+    if seconds < 1:
+        return f"{seconds * 1000:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+class Trace:
+    """Timing spans recorded for one question (or one query run), in the order they ended.
+
+    Spans are added from the GUI thread and from workers, so adding is locked. Offsets
+    are kept relative to the start of the trace with time.perf_counter().
+    """
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration = None
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def add(self, name, seconds, start=None, **attributes):
+        """Record a span that took seconds; start (a perf_counter value) defaults to seconds ago."""
+        if start is None:
+            start = time.perf_counter() - seconds
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "start": start - self._origin,
+                "duration": seconds,
+                "attributes": attributes
+            })
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the with-block; attributes added to the yielded dict are recorded too."""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.add(name, time.perf_counter() - start, start=start, **attributes)
+
+    def begin(self, name):
+        """Start a span that ends elsewhere (e.g. in a signal handler); returns its end(**attributes)."""
+        start = time.perf_counter()
+        ended = []
+
+        def end(**attributes):
+            if not ended:
+                ended.append(True)
+                self.add(name, time.perf_counter() - start, start=start, **attributes)
+        return end
+
+    def total(self, name):
+        """Seconds spent in all spans called name, e.g. every llm.generate of a repaired answer."""
+        with self._lock:
+            return sum(span["duration"] for span in self.spans if span["name"] == name)
+
+    def finish(self, **attributes):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._origin
+            self.attributes.update(attributes)
+        return self
+
+    def breakdown(self):
+        """Text table of the spans, one per line, for the chat."""
+        with self._lock:
+            spans = list(self.spans)
+        rows = []
+        for span in spans:
+            label = SPAN_LABELS.get(span["name"], span["name"])
+            extra = ", ".join(f"{value} {key}" for key, value in span["attributes"].items() if key in ("tokens", "rows"))
+            rows.append((label, format_duration(span["duration"]) + (f" ({extra})" if extra else "")))
+        if self.duration is not None:
+            rows.append(("Total", format_duration(self.duration)))
+        width = max((len(label) for label, _value in rows), default=0)
+        return "\n".join(f"{label.ljust(width)}  {value}" for label, value in rows)
+
+    def records(self):
+        """The trace as OpenTelemetry-style span dicts: a root span followed by its children."""
+        root_id = uuid.uuid4().hex[:16]
+        origin_ns = int(self.started_at * 1e9)
+        duration = self.duration if self.duration is not None else time.perf_counter() - self._origin
+        records = [{
+            "trace_id": self.trace_id,
+            "span_id": root_id,
+            "parent_span_id": None,
+            "name": self.name,
+            "start_time_unix_nano": origin_ns,
+            "end_time_unix_nano": origin_ns + int(duration * 1e9),
+            "attributes": self.attributes
+        }]
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            start_ns = origin_ns + int(span["start"] * 1e9)
+            records.append({
+                "trace_id": self.trace_id,
+                "span_id": uuid.uuid4().hex[:16],
+                "parent_span_id": root_id,
+                "name": span["name"],
+                "start_time_unix_nano": start_ns,
+                "end_time_unix_nano": start_ns + int(span["duration"] * 1e9),
+                "attributes": span["attributes"]
+            })
+        return records
+
+
+class SpanLog:
+    """Appends finished traces to a JSON-lines file, one span per line, for offline analysis.
+
+    The file is rotated once it reaches max_bytes (backups old files are kept). Lines are
+    written by a background thread, so write() never waits on the disk.
+    """
+    def __init__(self, path, max_bytes=1024 * 1024, backups=3):
+        self.handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.Queue()
+        self.listener = QueueListener(self._queue, self.handler)
+        self.listener.start()
+
+    def write(self, trace):
+        for record in trace.records():
+            line = json.dumps(record, default=str, ensure_ascii=False)
+            self._queue.put(logging.makeLogRecord({"msg": line, "levelno": logging.INFO, "levelname": "INFO"}))
+
+    def close(self):
+        self.listener.stop()
+        self.handler.close()